@@ -2,6 +2,8 @@ import streamlit as st
 import requests
 import os
 import re
+import json
+import time
 
 # Configuration
 API_URL = "http://localhost:8000"
@@ -42,6 +44,25 @@ def extract_chart_path(text):
     
     return None
 
+# --- Helper Function to Read the Progress Stream ---
+def stream_query(prompt):
+    """Yields (event, data) pairs from the server-sent events of /query/stream."""
+    with requests.post(f"{API_URL}/query/stream", json={"prompt": prompt}, stream=True) as response:
+        if response.status_code != 200:
+            try:
+                detail = response.json().get("detail", "Unknown error")
+            except ValueError:
+                detail = response.text or "Unknown error"
+            yield "error", {"detail": detail}
+            return
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event:
+                yield event, json.loads(line[len("data:"):].strip())
+                event = None
+
 # --- Initialization: Auto-Sync Files ---
 if "current_files" not in st.session_state:
     try:
@@ -113,51 +134,81 @@ if prompt := st.chat_input("e.g., 'Show me a histogram of product prices'"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Call FastAPI Query Endpoint
+    # Call the streaming Query Endpoint so progress shows while the agent works
     with st.chat_message("assistant"):
-        with st.spinner("🤖 Analyzing data..."):
-            try:
-                response = requests.post(
-                    f"{API_URL}/query", 
-                    json={"prompt": prompt}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    answer = data.get("answer", "No response.")
-                    
-                    # Display the text response
-                    st.markdown(answer)
-                    
-                    # Extract and display chart if present
-                    chart_path = extract_chart_path(answer)
-                    
-                    if chart_path and os.path.exists(chart_path):
-                        st.image(chart_path, caption="Generated Visualization", width=500)
-                        st.success(f"✅ Chart saved to: `{chart_path}`")
-                        # Save message WITH the specific chart path
-                        st.session_state.messages.append({
-                            "role": "assistant", 
-                            "content": answer,
-                            "chart_path": chart_path  # Store ONLY this specific chart
-                        })
+        status = st.status("🤖 Analyzing data...", expanded=False)
+        answer_box = st.empty()
+        try:
+            data, error_msg, streamed = None, None, ""
+            started = time.perf_counter()
+            for event, payload in stream_query(prompt):
+                if event == "route":
+                    if payload.get("answered_from_profile"):
+                        status.write("⚡ Answered from the file profile")
                     else:
-                        # No chart generated - explicitly set chart_path to None
-                        st.session_state.messages.append({
-                            "role": "assistant", 
-                            "content": answer,
-                            "chart_path": None  # Explicitly None so we know no chart exists
-                        })
-                        if chart_path:  # Path was found but file doesn't exist
-                            st.warning(f"⚠️ Chart path found but file doesn't exist: {chart_path}")
+                        sources = payload.get("db_files")
+                        target = f" ({', '.join(sources)})" if sources else ""
+                        status.write(f"🧭 Routed to **{payload.get('worker')}**{target}")
+                elif event == "sql":
+                    status.code(payload.get("query") or "", language="sql")
+                elif event == "code":
+                    status.code(payload.get("code") or "", language="python")
+                elif event == "tool_start":
+                    status.update(label=f"⚙️ Running {payload['tool']}...")
+                    streamed = ""  # Text written before a tool call isn't the answer
+                elif event == "tool_end":
+                    mark = "⚠️" if payload.get("error") else "✅"
+                    status.write(f"{mark} {payload['tool']} finished in {payload['seconds']:.2f}s")
+                    status.update(label="✍️ Writing the answer...")
+                elif event == "chart":
+                    status.write(f"📊 Chart ready: `{payload['path']}`")
+                elif event == "token":
+                    streamed += payload["text"]
+                    answer_box.markdown(streamed + "▌")
+                elif event == "done":
+                    data = payload
+                elif event == "error":
+                    error_msg = payload.get("detail", "Unknown error")
+
+            elapsed = time.perf_counter() - started
+            if data is not None:
+                status.update(label=f"✅ Done in {elapsed:.1f}s", state="complete")
+                answer = data.get("answer", "No response.")
+
+                # Display the text response
+                answer_box.markdown(answer)
+
+                # Extract and display chart if present
+                chart_path = extract_chart_path(answer)
+
+                if chart_path and os.path.exists(chart_path):
+                    st.image(chart_path, caption="Generated Visualization", width=500)
+                    st.success(f"✅ Chart saved to: `{chart_path}`")
+                    # Save message WITH the specific chart path
+                    st.session_state.messages.append({
+                        "role": "assistant", 
+                        "content": answer,
+                        "chart_path": chart_path  # Store ONLY this specific chart
+                    })
                 else:
-                    error_msg = response.json().get('detail', 'Unknown error')
-                    st.error(f"❌ Agent Error: {error_msg}")
-                    
-            except requests.exceptions.ConnectionError:
-                st.error("🔌 Could not connect to backend. Make sure FastAPI is running on http://localhost:8000")
-            except Exception as e:
-                st.error(f"❌ Unexpected error: {e}")
+                    # No chart generated - explicitly set chart_path to None
+                    st.session_state.messages.append({
+                        "role": "assistant", 
+                        "content": answer,
+                        "chart_path": None  # Explicitly None so we know no chart exists
+                    })
+                    if chart_path:  # Path was found but file doesn't exist
+                        st.warning(f"⚠️ Chart path found but file doesn't exist: {chart_path}")
+            else:
+                status.update(label="❌ Failed", state="error")
+                st.error(f"❌ Agent Error: {error_msg or 'The stream ended without an answer.'}")
+
+        except requests.exceptions.ConnectionError:
+            status.update(label="❌ Failed", state="error")
+            st.error("🔌 Could not connect to backend. Make sure FastAPI is running on http://localhost:8000")
+        except Exception as e:
+            status.update(label="❌ Failed", state="error")
+            st.error(f"❌ Unexpected error: {e}")
 
 # --- Footer with Chart Gallery ---
 st.divider()
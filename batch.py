@@ -0,0 +1,136 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+from config import settings
+from db_router import route_databases
+
+
+def normalize_prompt(prompt):
+    """Prompt text for duplicate detection: whitespace collapsed, case ignored."""
+    return " ".join(str(prompt).split()).casefold()
+
+
+def read_items(lines):
+    """
+    (id, prompt) of each non-empty JSONL line: a string, or an object with
+    a `prompt` (or `body`/`title`, as in a request backlog) and an optional
+    `id` (or `request_id`). Items without an id are numbered by line.
+    """
+    items = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if isinstance(item, str):
+            items.append((str(number), item))
+            continue
+        prompt = item.get("prompt") or item.get("body") or item.get("title")
+        if not prompt:
+            raise ValueError(f"Line {number} has no prompt.")
+        items.append((str(item.get("id") or item.get("request_id") or number), prompt))
+    return items
+
+
+async def run_batch(items, files, run, concurrency):
+    """
+    Answers (id, prompt) items with `run(prompt, files)` and yields one
+    result per item as soon as it is known. Identical prompts run once and
+    share the result; prompts are ordered by the file they target so
+    consecutive runs hit the same warm caches, and at most `concurrency`
+    run at a time.
+    """
+    batch_start = time.perf_counter()
+    groups = {}
+    for item_id, prompt in items:
+        groups.setdefault(normalize_prompt(prompt), []).append((item_id, prompt))
+
+    # Routing reads schema indexes, so prompts are routed `concurrency` at a time
+    routing = asyncio.Semaphore(max(1, concurrency))
+
+    async def target(prompt):
+        async with routing:
+            try:
+                return ", ".join(await asyncio.to_thread(route_databases, prompt, files))
+            except Exception:
+                return ""
+    routed = await asyncio.gather(*(target(members[0][1]) for members in groups.values()))
+    targets = dict(zip(groups, routed))
+    order = sorted(groups, key=lambda key: targets[key])  # stable: input order within a file
+
+    pending = asyncio.Queue()
+    for key in order:
+        pending.put_nowait(key)
+    results = asyncio.Queue()
+
+    async def worker():
+        while not pending.empty():
+            key = pending.get_nowait()
+            prompt = groups[key][0][1]
+            started = time.perf_counter()
+            outcome = {"error": "Run was interrupted."}
+            try:
+                outcome = {"answer": (await run(prompt, files))["answer"]}
+            except Exception as e:
+                outcome = {"error": str(e)}
+            finally:
+                # Reported even if the run is cancelled, so the loop below never waits forever
+                outcome["started"] = round(started - batch_start, 3)
+                outcome["seconds"] = round(time.perf_counter() - started, 3)
+                results.put_nowait((key, outcome))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(order))))]
+    try:
+        for _ in order:
+            key, outcome = await results.get()
+            first_id = groups[key][0][0]
+            for item_id, prompt in groups[key]:
+                yield {
+                    "id": item_id,
+                    "prompt": prompt,
+                    "target": targets[key],
+                    **outcome,
+                    "duplicate_of": first_id if item_id != first_id else None,
+                }
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def _run_file(args):
+    from main import answer_query, get_local_files
+
+    files = get_local_files()
+    if not files:
+        sys.exit("No data files found in the uploads directory.")
+    with (sys.stdin if args.input == "-" else open(args.input)) as f:
+        items = read_items(f)
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    started = time.perf_counter()
+    count = failed = 0
+    try:
+        async for result in run_batch(items, files, answer_query, args.concurrency):
+            out.write(json.dumps(result, default=str) + "\n")
+            out.flush()
+            count += 1
+            failed += "error" in result
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    unique = len({normalize_prompt(prompt) for _, prompt in items})
+    print(f"{count} results ({unique} unique prompts, {failed} failed) "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions over the uploaded files.")
+    parser.add_argument("input", help="JSONL file of prompts ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=settings.BATCH_CONCURRENCY,
+                        help="Prompts answered at the same time")
+    asyncio.run(_run_file(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
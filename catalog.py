@@ -0,0 +1,72 @@
+import threading
+from config import settings
+from data_cache import file_fingerprint
+
+
+class SchemaCatalog:
+    """
+    Per-file-version cache of the metadata we put in prompts (columns,
+    dtypes, sample rows). Each builder runs once per version of a file.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_path, builder, *args):
+        fingerprint = file_fingerprint(file_path)
+        key = (fingerprint, builder.__name__, args)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+
+        value = builder(file_path, *args)
+
+        with self._lock:
+            # Older versions of the same file are never asked for again
+            for old in [k for k in self._entries
+                        if k[0][0] == fingerprint[0] and k[0] != fingerprint]:
+                del self._entries[old]
+            self._entries[key] = value
+        return value
+
+
+schema_catalog = SchemaCatalog()
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def fit_to_budget(blocks, budget=None):
+    """
+    Joins (full, compact) metadata blocks within a token budget. Every
+    block gets its compact form first (column lists matter more than
+    samples), then blocks are upgraded to their full form in order while
+    the budget lasts. Blocks that don't fit at all are summarized in a note.
+    """
+    budget = settings.CATALOG_TOKEN_BUDGET if budget is None else budget
+    chosen = []
+    used = 0
+    for full, compact in blocks:
+        cost = estimate_tokens(compact)
+        if used + cost <= budget:
+            chosen.append(compact)
+            used += cost
+        else:
+            chosen.append(None)
+
+    for i, (full, compact) in enumerate(blocks):
+        if chosen[i] is None or full == compact:
+            continue
+        extra = estimate_tokens(full) - estimate_tokens(compact)
+        if used + extra <= budget:
+            chosen[i] = full
+            used += extra
+
+    parts = [text for text in chosen if text is not None]
+    omitted = len(chosen) - len(parts)
+    if omitted:
+        parts.append(f"... {omitted} more table(s) not shown.")
+    return "\n\n".join(parts)
@@ -0,0 +1,341 @@
+import os
+import operator
+import pandas as pd
+from config import settings
+from data_cache import pq, csv_columns, read_sidecar_columns, sidecar_path
+
+# Shown to the LLM when a file is streamed instead of loaded whole
+CHUNKED_API_HINT = """`df` is a STREAMING frame (the file is too large for memory), not a full pandas DataFrame.
+        Supported: df['col'] / df.col, filters like df[(df['a'] > 1) & (df['b'] == 'x')], df[['a', 'b']],
+        len(df), df.shape, df.columns, df.head(n), df.count();
+        on columns: sum, mean, min, max, count, nunique, unique, value_counts, std, var,
+        comparisons, arithmetic, isin, isna, notna, between;
+        df.groupby(keys)[cols] with sum, mean, min, max, count, size or agg([...]).
+        Results of those are regular pandas objects. Use .to_pandas() only on small filtered results."""
+
+
+def is_large_csv(file_path):
+    return os.path.getsize(file_path) >= settings.CSV_CHUNKED_MIN_BYTES
+
+
+def iter_csv_chunks(file_path, usecols=None):
+    """Yields `file_path` as DataFrame chunks of `settings.CSV_CHUNK_ROWS` rows."""
+    if read_sidecar_columns(file_path) is not None:
+        # Columnar copy exists - stream record batches of the needed columns
+        parquet = pq.ParquetFile(sidecar_path(file_path), memory_map=True)
+        for batch in parquet.iter_batches(batch_size=settings.CSV_CHUNK_ROWS,
+                                          columns=usecols):
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(file_path, usecols=usecols,
+                           chunksize=settings.CSV_CHUNK_ROWS)
+
+
+def _csv_source(file_path):
+    """Returns a reader: usecols -> iterator of DataFrame chunks."""
+    return lambda usecols: iter_csv_chunks(file_path, usecols)
+
+
+class ChunkedSeries:
+    """
+    A lazily evaluated column expression over a ChunkedFrame. Element-wise
+    operations build new expressions; reductions stream every chunk once
+    and merge the partial results.
+    """
+
+    def __init__(self, frame, func, columns, name=None):
+        self._frame = frame        # ChunkedFrame supplying (filtered) chunks
+        self._func = func          # chunk DataFrame -> pandas Series
+        self._columns = columns    # source columns `func` reads
+        self.name = name
+
+    def _derive(self, func, columns=None):
+        return ChunkedSeries(self._frame, func, columns or self._columns, self.name)
+
+    def _binary(self, other, op):
+        if isinstance(other, ChunkedSeries):
+            return self._derive(lambda c: op(self._func(c), other._func(c)),
+                                self._columns | other._columns)
+        return self._derive(lambda c: op(self._func(c), other))
+
+    def _parts(self):
+        for chunk in self._frame._chunks(self._columns):
+            yield self._func(chunk)
+
+    # Element-wise operations
+    def __gt__(self, other): return self._binary(other, operator.gt)
+    def __ge__(self, other): return self._binary(other, operator.ge)
+    def __lt__(self, other): return self._binary(other, operator.lt)
+    def __le__(self, other): return self._binary(other, operator.le)
+    def __eq__(self, other): return self._binary(other, operator.eq)
+    def __ne__(self, other): return self._binary(other, operator.ne)
+    def __and__(self, other): return self._binary(other, operator.and_)
+    def __or__(self, other): return self._binary(other, operator.or_)
+    def __add__(self, other): return self._binary(other, operator.add)
+    def __sub__(self, other): return self._binary(other, operator.sub)
+    def __mul__(self, other): return self._binary(other, operator.mul)
+    def __truediv__(self, other): return self._binary(other, operator.truediv)
+    def __radd__(self, other): return self._binary(other, lambda a, b: b + a)
+    def __rsub__(self, other): return self._binary(other, lambda a, b: b - a)
+    def __rmul__(self, other): return self._binary(other, lambda a, b: b * a)
+    def __invert__(self): return self._derive(lambda c: ~self._func(c))
+    def __neg__(self): return self._derive(lambda c: -self._func(c))
+
+    def __bool__(self):
+        raise ValueError("The truth value of a streamed column is ambiguous. Use & / | for filters.")
+
+    __hash__ = object.__hash__
+
+    def isin(self, values): return self._derive(lambda c: self._func(c).isin(values))
+    def isna(self): return self._derive(lambda c: self._func(c).isna())
+    def notna(self): return self._derive(lambda c: self._func(c).notna())
+    def between(self, left, right): return self._derive(lambda c: self._func(c).between(left, right))
+    def astype(self, dtype): return self._derive(lambda c: self._func(c).astype(dtype))
+    def abs(self): return self._derive(lambda c: self._func(c).abs())
+
+    # Reductions (merged across chunks)
+    def sum(self):
+        return sum((part.sum() for part in self._parts()), 0)
+
+    def count(self):
+        return int(sum(part.count() for part in self._parts()))
+
+    def _moments(self):
+        """
+        (count, mean, M2) merged across chunks with Chan et al.'s parallel
+        update. Unlike sum-of-squares, it keeps its precision on large
+        values with a small spread (e.g. epoch timestamps).
+        """
+        n, mean, m2 = 0, 0.0, 0.0
+        for part in self._parts():
+            part = part.dropna().astype("float64")
+            if not len(part):
+                continue
+            part_n, part_mean = len(part), float(part.mean())
+            part_m2 = float(((part - part_mean) ** 2).sum())
+            total = n + part_n
+            delta = part_mean - mean
+            mean += delta * part_n / total
+            m2 += part_m2 + delta * delta * n * part_n / total
+            n = total
+        return n, mean, m2
+
+    def mean(self):
+        n, mean, _ = self._moments()
+        return mean if n else float("nan")
+
+    def var(self, ddof=1):
+        n, _, m2 = self._moments()
+        if n - ddof <= 0:
+            return float("nan")
+        return m2 / (n - ddof)
+
+    def std(self, ddof=1):
+        return self.var(ddof) ** 0.5
+
+    def min(self):
+        return min((part.min() for part in self._parts() if part.count()), default=float("nan"))
+
+    def max(self):
+        return max((part.max() for part in self._parts() if part.count()), default=float("nan"))
+
+    def unique(self):
+        seen = pd.Series(dtype=object)
+        for part in self._parts():
+            seen = pd.concat([seen, pd.Series(part.dropna().unique())]).drop_duplicates()
+        return seen.to_numpy()
+
+    def nunique(self):
+        return len(self.unique())
+
+    def value_counts(self, normalize=False):
+        counts = None
+        for part in self._parts():
+            partial = part.value_counts()
+            counts = partial if counts is None else counts.add(partial, fill_value=0)
+        if counts is None:
+            return pd.Series(dtype="int64", name="count")
+        counts = counts.astype("int64").sort_values(ascending=False)
+        return (counts / counts.sum()).rename("proportion") if normalize else counts
+
+    def to_pandas(self):
+        """Materializes the (filtered) column. Only for small results."""
+        parts = list(self._parts())
+        return pd.concat(parts) if parts else pd.Series(dtype=object, name=self.name)
+
+    def __repr__(self):
+        return f"<ChunkedSeries {self.name!r}: streamed column, use a reduction or .to_pandas()>"
+
+
+class ChunkedFrame:
+    """
+    Out-of-core stand-in for `df` on CSVs too large to load. Reads the
+    file in chunks of only the columns an operation needs, applies any row
+    filters, and merges per-chunk results.
+    """
+
+    def __init__(self, source, columns, mask=None, name="df", file_columns=None):
+        self._source = source
+        self.columns = pd.Index(columns)
+        self._mask = mask
+        self._name = name
+        # Every column of the file; filters may read columns not selected
+        self._file_columns = list(file_columns if file_columns is not None else columns)
+
+    @classmethod
+    def from_csv(cls, file_path):
+        return cls(_csv_source(file_path), csv_columns(file_path),
+                   name=os.path.basename(file_path))
+
+    def _with(self, columns=None, mask=None):
+        return ChunkedFrame(self._source, self.columns if columns is None else columns,
+                            mask if mask is not None else self._mask,
+                            self._name, self._file_columns)
+
+    def _chunks(self, needed):
+        usecols = set(needed) | (self._mask._columns if self._mask is not None else set())
+        # Keep file order and always read at least one column (for row counts)
+        usecols = [c for c in self._file_columns if c in usecols] or [self._file_columns[0]]
+        for chunk in self._source(usecols):
+            if self._mask is not None:
+                chunk = chunk[self._mask._func(chunk).fillna(False).astype(bool)]
+            yield chunk
+
+    def _column(self, key):
+        if key not in self.columns:
+            raise KeyError(key)
+        return ChunkedSeries(self, lambda c: c[key], {key}, name=key)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._column(key)
+        if isinstance(key, ChunkedSeries):
+            mask = key if self._mask is None else (self._mask & key)
+            return self._with(mask=mask)
+        if isinstance(key, (list, tuple, pd.Index)):
+            missing = [k for k in key if k not in self.columns]
+            if missing:
+                raise KeyError(missing)
+            return self._with(columns=list(key))
+        raise TypeError(f"Unsupported selection on a streaming frame: {key!r}")
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self.columns:
+            return self._column(name)
+        raise AttributeError(
+            f"'{name}' is not supported on a streaming frame (file too large to load). "
+            "Use column reductions, filters or groupby aggregations."
+        )
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks([]))
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def head(self, n=5):
+        rows = []
+        remaining = n
+        for chunk in self._chunks(self.columns):
+            rows.append(chunk[list(self.columns)].head(remaining))
+            remaining -= len(rows[-1])
+            if remaining <= 0:
+                break
+        return pd.concat(rows) if rows else pd.DataFrame(columns=self.columns)
+
+    def count(self):
+        counts = None
+        for chunk in self._chunks(self.columns):
+            partial = chunk[list(self.columns)].count()
+            counts = partial if counts is None else counts + partial
+        return counts
+
+    def groupby(self, by):
+        keys = [by] if isinstance(by, str) else list(by)
+        return ChunkedGroupBy(self, keys)
+
+    def to_pandas(self):
+        """Materializes the (filtered) frame. Only for small results."""
+        parts = [chunk[list(self.columns)] for chunk in self._chunks(self.columns)]
+        return pd.concat(parts) if parts else pd.DataFrame(columns=self.columns)
+
+    def __repr__(self):
+        return f"<ChunkedFrame {self._name}: {len(self.columns)} columns, streamed in chunks>"
+
+
+class ChunkedGroupBy:
+    """Group-by over a ChunkedFrame: per-chunk partial aggregates, merged."""
+
+    _MERGEABLE = ("sum", "count", "mean", "min", "max", "size")
+
+    def __init__(self, frame, keys, values=None, single=False):
+        self._frame = frame
+        self._keys = keys
+        self._values = values
+        self._single = single  # selected with a single column name
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return ChunkedGroupBy(self._frame, self._keys, [key], single=True)
+        return ChunkedGroupBy(self._frame, self._keys, list(key))
+
+    def _value_columns(self):
+        if self._values is not None:
+            return self._values
+        return [c for c in self._frame.columns if c not in self._keys]
+
+    def _partials(self, stats):
+        values = self._value_columns()
+        levels = list(range(len(self._keys)))
+        collected = {stat: [] for stat in stats}
+        for chunk in self._frame._chunks(self._keys + values):
+            grouped = chunk.groupby(self._keys)
+            for stat in stats:
+                if stat == "size":
+                    collected[stat].append(grouped.size())
+                else:
+                    collected[stat].append(getattr(grouped[values], stat)())
+
+        merged = {}
+        for stat, parts in collected.items():
+            if not parts:
+                merged[stat] = pd.Series(dtype="float64") if stat == "size" else pd.DataFrame(columns=values)
+                continue
+            combined = pd.concat(parts).groupby(level=levels)
+            merged[stat] = combined.sum() if stat in ("sum", "count", "size") else getattr(combined, stat)()
+        return merged
+
+    def _shape_result(self, result):
+        if self._single and isinstance(result, pd.DataFrame):
+            return result[self._values[0]]
+        return result
+
+    def _aggregate(self, how):
+        if how not in self._MERGEABLE:
+            raise ValueError(f"Aggregation '{how}' is not supported on a streaming frame.")
+        if how == "size":
+            return self._partials(["size"])["size"]
+        if how == "mean":
+            partials = self._partials(["sum", "count"])
+            return self._shape_result(partials["sum"] / partials["count"])
+        return self._shape_result(self._partials([how])[how])
+
+    def sum(self): return self._aggregate("sum")
+    def count(self): return self._aggregate("count")
+    def mean(self): return self._aggregate("mean")
+    def min(self): return self._aggregate("min")
+    def max(self): return self._aggregate("max")
+    def size(self): return self._aggregate("size")
+
+    def agg(self, how):
+        if isinstance(how, str):
+            return self._aggregate(how)
+        results = pd.concat({h: self._aggregate(h) for h in how}, axis=1)
+        if self._single or not isinstance(results.columns, pd.MultiIndex):
+            return results
+        # Match pandas' (column, statistic) layout
+        order = pd.MultiIndex.from_product([self._value_columns(), list(how)])
+        return results.swaplevel(axis=1)[order]
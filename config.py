@@ -13,6 +13,57 @@ class Settings:
     # This creates an absolute path to the 'uploads' folder in your project root
     UPLOAD_DIR = BASE_DIR / "CSV&SQL agent/uploads"
     MODEL_NAME = "llama-3.3-70b"
+    # Memory budget for parsed DataFrames kept between tool calls
+    DF_CACHE_MAX_BYTES = int(os.getenv("DF_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+    # CSVs at least this big are streamed in chunks instead of loaded whole
+    CSV_CHUNKED_MIN_BYTES = int(os.getenv("CSV_CHUNKED_MIN_BYTES", 1024 * 1024 * 1024))
+    CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", 500_000))
+    # Text columns with few distinct values are stored as categoricals
+    SCHEMA_CATEGORY_MAX_UNIQUE = int(os.getenv("SCHEMA_CATEGORY_MAX_UNIQUE", 1000))
+    SCHEMA_CATEGORY_MAX_RATIO = float(os.getenv("SCHEMA_CATEGORY_MAX_RATIO", 0.5))
+    # Upload-time statistics profiles
+    PROFILE_MAX_DISTINCT = int(os.getenv("PROFILE_MAX_DISTINCT", 10_000))
+    PROFILE_TOP_VALUES = int(os.getenv("PROFILE_TOP_VALUES", 5))
+    # Schema catalog injected into the CSV / SQL prompts
+    CATALOG_TOKEN_BUDGET = int(os.getenv("CATALOG_TOKEN_BUDGET", 1500))
+    CATALOG_SAMPLE_ROWS = int(os.getenv("CATALOG_SAMPLE_ROWS", 3))
+    # Databases with more tables only get the most relevant ones in the SQL prompt
+    SCHEMA_TOP_K = int(os.getenv("SCHEMA_TOP_K", 8))
+    SCHEMA_INDEX_SAMPLE_ROWS = int(os.getenv("SCHEMA_INDEX_SAMPLE_ROWS", 50))
+    # Pool of worker processes that run LLM-generated Python
+    EXECUTOR_POOL_SIZE = int(os.getenv("EXECUTOR_POOL_SIZE", min(4, os.cpu_count() or 1)))
+    EXECUTOR_MAX_RUNS = int(os.getenv("EXECUTOR_MAX_RUNS", 50))
+    EXECUTOR_MAX_RSS_BYTES = int(os.getenv("EXECUTOR_MAX_RSS_BYTES", 2 * 1024 * 1024 * 1024))
+    # Limits per code execution (0 disables)
+    EXEC_WALL_TIME_SECONDS = float(os.getenv("EXEC_WALL_TIME_SECONDS", 60))
+    EXEC_CPU_TIME_SECONDS = int(os.getenv("EXEC_CPU_TIME_SECONDS", 60))
+    EXEC_MEMORY_BYTES = int(os.getenv("EXEC_MEMORY_BYTES", 4 * 1024 * 1024 * 1024))
+    # Read-only SQLite connections (shared pool, tuned pragmas)
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 8))
+    SQLITE_IMMUTABLE = os.getenv("SQLITE_IMMUTABLE", "0") == "1"
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+    SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+    # Guardrails for LLM-written SQL (0 disables a limit)
+    SQL_QUERY_TIMEOUT_SECONDS = float(os.getenv("SQL_QUERY_TIMEOUT_SECONDS", 30))
+    SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 200000))
+    SQL_MAX_BYTES = int(os.getenv("SQL_MAX_BYTES", 128 * 1024 * 1024))
+    # CSVs up to this size are also exposed as SQL tables next to the databases
+    FEDERATED_CSV_MAX_BYTES = int(os.getenv("FEDERATED_CSV_MAX_BYTES", 256 * 1024 * 1024))
+    # Arrow copies of SQL results, reused by the chart step
+    SQL_RESULT_STORE_MAX_BYTES = int(os.getenv("SQL_RESULT_STORE_MAX_BYTES", 512 * 1024 * 1024))
+    # On-disk memo of tool outputs (0 size or TTL disables it)
+    RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(".cache", "tool_results.sqlite"))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", 24 * 60 * 60))
+    # Background jobs (POST /jobs), persisted so a restart resumes them
+    JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 1000))
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 60 * 60))
+    # Batch runs (POST /query/batch, batch.py): prompts answered at the same time
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 16))
 
 settings = Settings()
 
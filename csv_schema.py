@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+from config import settings
+
+# Bump when inference rules change so old sidecars get rebuilt
+SCHEMA_VERSION = 2
+
+_DATE_PATTERN = re.compile(r"^\d{4}-\d{1,2}-\d{1,2}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?$|^\d{1,2}/\d{1,2}/\d{4}$")
+_BOOL_VALUES = {"true": True, "false": False}
+# Smallest integer width we downcast to. Narrower types make LLM-written
+# arithmetic like `df.col * 1000` overflow or raise.
+_INT_TYPES = [np.int32]
+
+
+def schema_path(csv_path):
+    """Location of the JSON schema sidecar of `csv_path`."""
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, ".cache", f"{name}.schema.json")
+
+
+def _infer_column(series):
+    """
+    Returns the compact dtype name for one column. Floats stay float64:
+    pandas sums and means float32 columns in float32, so totals of large
+    values would drift even when every stored value fits exactly.
+    """
+    values = series.dropna()
+
+    if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        if len(values) == 0:
+            return str(series.dtype)
+        # Square-safe: products of two downcast columns still fit
+        bound = max(abs(int(values.min())), abs(int(values.max())))
+        for int_type in _INT_TYPES:
+            if bound * bound <= np.iinfo(int_type).max:
+                return np.dtype(int_type).name
+        return str(series.dtype)
+
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return str(series.dtype)
+    if len(values) == 0:
+        return str(series.dtype)
+
+    text = values.astype(str)
+    if set(text.str.lower().unique()) <= set(_BOOL_VALUES) and not series.isna().any():
+        return "bool"
+
+    sample = text.head(200)
+    if sample.str.match(_DATE_PATTERN).all():
+        parsed = pd.to_datetime(values, errors="coerce")
+        if parsed.notna().all():
+            return "datetime64[ns]"
+
+    distinct = values.nunique()
+    if distinct <= settings.SCHEMA_CATEGORY_MAX_UNIQUE and distinct <= len(values) * settings.SCHEMA_CATEGORY_MAX_RATIO:
+        return "category"
+    return str(series.dtype)
+
+
+def infer_schema(df):
+    """Maps every column to the most compact dtype that keeps its values."""
+    return {column: _infer_column(df[column]) for column in df.columns}
+
+
+def apply_schema(df, schema):
+    """Returns `df` with its columns converted to the `schema` dtypes."""
+    converted = {}
+    for column, dtype in schema.items():
+        if column not in df.columns or str(df[column].dtype) == dtype:
+            continue
+        series = df[column]
+        if dtype == "bool":
+            converted[column] = series.astype(str).str.lower().map(_BOOL_VALUES).astype(bool)
+        elif dtype.startswith("datetime64"):
+            converted[column] = pd.to_datetime(series, errors="coerce")
+        else:
+            converted[column] = series.astype(dtype)
+    return df.assign(**converted) if converted else df
+
+
+def plain_categories(df):
+    """
+    Returns `df` with its categorical columns as plain object columns, the
+    way pd.read_csv gives them. Categoricals keep the stored and cached
+    copies small, but change what user code gets back (value_counts lists
+    unused categories, groupby depends on `observed`).
+    """
+    categorical = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return df
+    return df.assign(**{column: df[column].astype(object) for column in categorical})
+
+
+def _stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns,
+            "schema_version": SCHEMA_VERSION}
+
+
+def load_schema(csv_path):
+    """Saved schema of this version of `csv_path`, or None."""
+    target = schema_path(csv_path)
+    if not os.path.exists(target):
+        return None
+    try:
+        with open(target) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(saved.get(k) != v for k, v in _stamp(csv_path).items()):
+        return None
+    return saved["columns"]
+
+
+def save_schema(csv_path, schema):
+    target = schema_path(csv_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({**_stamp(csv_path), "columns": schema}, f, indent=2)
+    os.replace(tmp_path, target)
+
+
+def optimize_dtypes(csv_path, df):
+    """
+    Applies the saved schema of `csv_path` to `df`, inferring and saving
+    it first if this version of the file has none yet.
+    """
+    schema = load_schema(csv_path)
+    if schema is None:
+        schema = infer_schema(df)
+        try:
+            save_schema(csv_path, schema)
+        except OSError as e:
+            print(f"WARNING: Could not save schema for {csv_path}: {e}")
+    return apply_schema(df, schema)
+
+
+def read_csv_typed(csv_path, **kwargs):
+    """pd.read_csv that applies the saved schema of `csv_path`, if any."""
+    df = pd.read_csv(csv_path, **kwargs)
+    schema = load_schema(csv_path)
+    return apply_schema(df, schema) if schema else df
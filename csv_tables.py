@@ -0,0 +1,83 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from config import settings
+from data_cache import load_csv
+
+_building_lock = threading.Lock()
+
+
+def csv_database_path(csv_path):
+    """Location of the SQLite copy of `csv_path` (one table named after the file)."""
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, ".cache", f"{name}.sqlite")
+
+
+def csv_table_name(csv_path):
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def _stamp(csv_path):
+    """31-bit id of this version of the CSV, kept in the copy's user_version."""
+    stat = os.stat(csv_path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return int(digest[:7], 16)
+
+
+def _is_current(csv_path, target):
+    if not os.path.exists(target):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{target}?mode=ro", uri=True)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0] == _stamp(csv_path)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+def ensure_csv_database(csv_path):
+    """
+    Returns the path of an up-to-date SQLite copy of `csv_path`, writing it
+    first if needed, or None when the CSV is too large to be exposed as a
+    SQL table (FEDERATED_CSV_MAX_BYTES).
+    """
+    if os.path.getsize(csv_path) > settings.FEDERATED_CSV_MAX_BYTES:
+        return None
+    target = csv_database_path(csv_path)
+    with _building_lock:
+        if _is_current(csv_path, target):
+            return target
+        stamp = _stamp(csv_path)
+        df = load_csv(csv_path)
+        # Categoricals go in as their values, dates as ISO text
+        for column in df.columns:
+            if str(df[column].dtype) == "category":
+                df[column] = df[column].astype(object)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            df.to_sql(csv_table_name(csv_path), conn, index=False, chunksize=50000)
+            conn.execute(f"PRAGMA user_version = {stamp}")
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, target)
+    return target
+
+
+def database_path(file_name, upload_dir="uploads"):
+    """
+    SQLite file behind an uploaded file name: the .db itself, or the SQL
+    copy of a CSV (None if that CSV can't be exposed).
+    """
+    path = os.path.join(upload_dir, os.path.basename(file_name))
+    if file_name.lower().endswith(".csv"):
+        return ensure_csv_database(path)
+    return path
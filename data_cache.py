@@ -0,0 +1,252 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from config import settings
+from csv_schema import SCHEMA_VERSION, optimize_dtypes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Columnar sidecars are optional; fall back to CSV parsing
+    pa = None
+    pq = None
+
+# pandas >= 3 always uses Copy-on-Write; on 2.x it is an opt-in option
+_PANDAS_MAJOR = int(pd.__version__.split(".")[0])
+
+
+def _copy_on_write():
+    """Whether shallow copies are safe, i.e. writes never reach the original."""
+    return _PANDAS_MAJOR >= 3 or pd.get_option("mode.copy_on_write") is True
+
+
+def file_fingerprint(file_path):
+    """Identifies one version of a file: (absolute path, size, mtime)."""
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+class DataFrameCache:
+    """
+    Process-wide LRU cache of parsed DataFrames keyed by file fingerprint
+    plus the loaded column subset (None for every column).
+    Entries are evicted (least recently used first) once the total memory
+    of cached frames exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (df, nbytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """Memory currently held by cached frames."""
+        return self._total_bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            # Bigger than the whole budget - don't flush everything for it
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (df, nbytes)
+            self._total_bytes += nbytes
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+
+    def invalidate_stale(self, fingerprint):
+        """Drops cached entries for other versions of the same file."""
+        with self._lock:
+            for key in [k for k in self._entries
+                        if k[0] == fingerprint[0] and k[:3] != fingerprint]:
+                self._total_bytes -= self._entries.pop(key)[1]
+
+    def invalidate(self, file_path):
+        """Drops every cached version of `file_path`."""
+        abs_path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == abs_path]:
+                self._total_bytes -= self._entries.pop(key)[1]
+
+
+df_cache = DataFrameCache(settings.DF_CACHE_MAX_BYTES)
+
+
+def sidecar_path(csv_path):
+    """Location of the columnar (Parquet) copy of `csv_path`."""
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, ".cache", f"{name}.parquet")
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {b"source_size": str(stat.st_size).encode(),
+            b"source_mtime_ns": str(stat.st_mtime_ns).encode(),
+            b"schema_version": str(SCHEMA_VERSION).encode()}
+
+
+def ingest_csv(csv_path, df=None):
+    """
+    Writes a Parquet sidecar for `csv_path` with the compact dtypes of its
+    schema sidecar (categoricals, booleans, dates, downcast integers). The
+    sidecar is stamped with the CSV's size and mtime so a re-uploaded file
+    is never served from a stale copy.
+    Returns the parsed DataFrame, or None for files too large to load
+    (those are converted chunk by chunk).
+    """
+    stamp = _source_stamp(csv_path)
+    if df is None and os.path.getsize(csv_path) >= settings.CSV_CHUNKED_MIN_BYTES:
+        if pq is not None:
+            _ingest_chunked(csv_path, stamp)
+        return None
+    if df is None:
+        df = optimize_dtypes(csv_path, pd.read_csv(csv_path))
+    if pq is None:
+        return df
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **stamp})
+
+    target = sidecar_path(csv_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, target)
+    return df
+
+
+def _ingest_chunked(csv_path, stamp):
+    """
+    Streams a large CSV into its sidecar one chunk at a time. Later chunks
+    are cast to the first chunk's schema; if they don't fit (e.g. a column
+    that only turns out to be text later on) no sidecar is written.
+    """
+    target = sidecar_path(csv_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    writer = None
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=settings.CSV_CHUNK_ROWS):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema.with_metadata({**(table.schema.metadata or {}), **stamp})
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(table.cast(schema))
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp_path, target)
+    except Exception as e:
+        print(f"WARNING: Chunked ingestion of {csv_path} failed: {e}")
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_sidecar_columns(csv_path):
+    """Column names from a current sidecar of `csv_path`, else None."""
+    if pq is None:
+        return None
+    target = sidecar_path(csv_path)
+    if not os.path.exists(target):
+        return None
+    try:
+        schema = pq.read_schema(target)
+    except Exception:
+        return None
+    metadata = schema.metadata or {}
+    if any(metadata.get(k) != v for k, v in _source_stamp(csv_path).items()):
+        return None
+    return list(schema.names)
+
+
+def read_sidecar(csv_path, columns=None):
+    """Loads the Parquet sidecar of `csv_path`, or None if missing or stale."""
+    if read_sidecar_columns(csv_path) is None:
+        return None
+    target = sidecar_path(csv_path)
+    try:
+        return pq.read_table(target, columns=columns, memory_map=True).to_pandas()
+    except Exception as e:
+        print(f"WARNING: Ignoring unreadable sidecar {target}: {e}")
+        return None
+
+
+def _parse_csv(csv_path):
+    """Full text parse; also (re)builds the sidecars for the next load."""
+    df = optimize_dtypes(csv_path, pd.read_csv(csv_path))
+    try:
+        ingest_csv(csv_path, df)
+    except Exception as e:
+        print(f"WARNING: Could not write sidecar for {csv_path}: {e}")
+    return df
+
+
+def csv_columns(file_path):
+    """Column names of a CSV, without parsing its rows."""
+    columns = read_sidecar_columns(file_path)
+    if columns is None:
+        columns = list(pd.read_csv(file_path, nrows=0).columns)
+    return columns
+
+
+def _view(df):
+    """
+    Per-call copy: shallow under Copy-on-Write, deep otherwise, so code
+    mutating its frame never changes the cached one.
+    """
+    return df.copy(deep=not _copy_on_write())
+
+
+def load_csv(file_path, columns=None):
+    """
+    Returns the CSV at `file_path` as a DataFrame, reading it (from its
+    Parquet sidecar when possible) only when this version of the file is
+    not cached yet. Callers get their own view, so mutations never leak
+    into the cache or into the next call.
+    Pass `columns` to load only those columns (in file order).
+    """
+    fingerprint = file_fingerprint(file_path)
+    full_key = fingerprint + (None,)
+    key = fingerprint + (tuple(columns),) if columns is not None else full_key
+
+    df = df_cache.get(key)
+    if df is not None:
+        return _view(df)
+
+    if columns is not None:
+        # Projecting an already cached full frame beats another read
+        full = df_cache.get(full_key)
+        if full is not None:
+            return _view(full[list(columns)])
+
+    # A new version of the file makes older entries unreachable
+    df_cache.invalidate_stale(fingerprint)
+
+    df = read_sidecar(file_path, list(columns) if columns is not None else None)
+    if df is None:
+        # No usable sidecar (e.g. file copied in by hand): parse everything
+        full = _parse_csv(file_path)
+        df_cache.put(full_key, full)
+        if columns is None:
+            return _view(full)
+        df = full[list(columns)]
+    df_cache.put(key, df)
+    return _view(df)
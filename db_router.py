@@ -0,0 +1,95 @@
+import os
+import re
+from catalog import schema_catalog
+from schema_index import load_schema_index, score_tables, tokenize
+from sql_check import table_columns
+from csv_tables import database_path
+
+# Name parts too common to tell databases apart
+_GENERIC_TERMS = {"id", "name", "date", "type", "code", "description", "value", "number",
+                  "average", "total", "count", "sum", "max", "min"}
+
+
+def database_alias(db_file):
+    """Schema name a database is attached under ("Sales 2024.db" -> sales_2024)."""
+    alias = re.sub(r"\W+", "_", os.path.splitext(os.path.basename(db_file))[0]).strip("_").lower()
+    if not alias or alias[0].isdigit() or alias in ("main", "temp"):
+        alias = f"db_{alias}"
+    return alias
+
+
+def attach_list(db_files, upload_dir="uploads"):
+    """
+    (alias, path) of every database after the first, i.e. the attached
+    ones. CSVs are attached through their SQLite copy.
+    """
+    attached, seen = [], {"main", "temp"}
+    for db_file in db_files[1:]:
+        path = database_path(db_file, upload_dir)
+        if path is None:
+            continue
+        alias = base = database_alias(db_file)
+        n = 2
+        while alias in seen:
+            alias, n = f"{base}_{n}", n + 1
+        seen.add(alias)
+        attached.append((alias, path))
+    return attached
+
+
+def _name_terms(db_path):
+    """Words of every table and column name of a database."""
+    terms = set()
+    for table, columns in schema_catalog.get(db_path, table_columns, False).items():
+        terms.update(tokenize(table))
+        for column in columns:
+            terms.update(tokenize(column))
+    return terms - _GENERIC_TERMS
+
+
+def route_databases(question, db_files, upload_dir="uploads"):
+    """
+    Picks the database(s) a question is about, using their schema indexes
+    (CSVs count as one-table databases).
+    The best match comes first and is the main database; another database
+    is added (to be attached) when the question names it or uses a table or
+    column name only it has. Falls back to the first database when nothing
+    matches.
+    """
+    db_files = list(db_files)
+    if len(db_files) <= 1:
+        return db_files
+
+    words = set(tokenize(question))
+    candidates = []  # (named, score, db_file, question words matching its table/column names)
+    for db_file in db_files:
+        try:
+            path = database_path(db_file, upload_dir)
+            if path is None:
+                continue
+            scores = score_tables(schema_catalog.get(path, load_schema_index), question)
+            matched = words & _name_terms(path)
+        except Exception as e:
+            print(f"WARNING: Could not index {db_file}: {e}")
+            continue
+        stem = tokenize(os.path.splitext(db_file)[0])
+        named = bool(stem) and set(stem) <= words
+        candidates.append((named, max(scores.values(), default=0.0), db_file, matched))
+    if not candidates or not any(c[0] or c[1] for c in candidates):
+        return db_files[:1]
+
+    # Matching names first: BM25 scores aren't comparable across databases
+    candidates.sort(key=lambda c: (c[0], len(c[3]), c[1]), reverse=True)
+    chosen = [candidates[0]]
+    covered = set(candidates[0][3])
+    for named, score, db_file, matched in candidates[1:]:
+        if named or (score > 0 and matched - covered):
+            chosen.append((named, score, db_file, matched))
+            covered |= matched
+
+    # A pick whose matching names the others all have adds nothing
+    for candidate in list(chosen):
+        others = [c for c in chosen if c is not candidate]
+        if others and not candidate[0] and candidate[3] <= set().union(*(c[3] for c in others)):
+            chosen.remove(candidate)
+    return [c[2] for c in chosen]
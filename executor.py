@@ -0,0 +1,361 @@
+import os
+import re
+import sys
+import queue
+import signal
+import atexit
+import threading
+import traceback
+import multiprocessing
+from io import StringIO
+from config import settings
+
+
+try:
+    import resource
+except ImportError:  # Windows: only the wall-clock limit applies
+    resource = None
+
+# Tool output starting with this means the code was stopped by a limit
+BUDGET_EXCEEDED = "Error: Execution budget exceeded"
+
+_LIMIT_UNITS = {"wall_time": "s", "cpu_time": "s", "memory": " bytes"}
+
+
+class _BudgetExceeded(BaseException):
+    """Raised inside a worker when a job hits a limit. BaseException so the
+    generated code's own `except Exception` can't swallow it."""
+
+    def __init__(self, kind):
+        super().__init__(kind)
+        self.kind = kind
+
+
+def _sanitize(code):
+    """Strips stray backticks / a leading 'python' the LLM sometimes adds."""
+    code = re.sub(r"^(\s|`)*(?i:python)?\s*", "", code)
+    return re.sub(r"(\s|`)*$", "", code)
+
+
+def _current_rss():
+    """Resident memory of this process in bytes (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return 0
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _load_dataframe(job):
+    """Builds the `df` a job asks for, inside the worker process."""
+    loader = job["loader"]
+    if loader == "csv":
+        from data_cache import load_csv
+        from csv_schema import plain_categories
+        return plain_categories(load_csv(job["file_path"], columns=job.get("columns")))
+    if loader == "chunked":
+        from chunked import ChunkedFrame
+        return ChunkedFrame.from_csv(job["file_path"])
+    if loader == "sql":
+        # Usually already fetched by the SQL tool and kept in the result store
+        from sql_results import run_query
+        attach = tuple(tuple(pair) for pair in job.get("attach", ()))
+        return run_query(job["db_path"], job["sql_query"], attach)
+    raise ValueError(f"Unknown loader: {loader}")
+
+
+# Limit hit by the running job, set by the signal handlers. A signal that
+# lands inside a C callback (e.g. SQLite's progress handler) can't raise
+# through it, so the callback returns this and _run_job checks it.
+_budget_hit = None
+
+
+def budget_hit():
+    """Kind of limit the running job hit ("wall_time", ...), or None."""
+    return _budget_hit
+
+
+def _raise_budget(kind):
+    def handler(signum, frame):
+        global _budget_hit
+        _budget_hit = kind
+        raise _BudgetExceeded(kind)
+    return handler
+
+
+def _arm_limits(limits):
+    """Starts this job's wall-clock timer and CPU-time budget."""
+    if limits.get("wall_time") and hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, limits["wall_time"])
+    if limits.get("cpu_time") and resource is not None:
+        # RLIMIT_CPU counts the whole process, so budget from what's used so far
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = used + int(limits["cpu_time"]) + 1
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _disarm_limits():
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    if resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _run_job(job, pd, plt):
+    global _budget_hit
+    reply = {"output": "", "chart_path": None, "rows": None, "error": None,
+             "budget_exceeded": None}
+    plt.close("all")
+    old_stdout = sys.stdout
+    _budget_hit = None
+    _arm_limits(job.get("limits", {}))
+    try:
+        try:
+            df = _load_dataframe(job)
+            reply["rows"] = len(df) if job["loader"] != "chunked" else None
+        except MemoryError:
+            raise _BudgetExceeded("memory")
+        except Exception as e:
+            if _budget_hit:
+                # e.g. sqlite3 "interrupted": the limit fired mid-query
+                raise _BudgetExceeded(_budget_hit)
+            reply["error"] = str(e)
+            reply["traceback"] = traceback.format_exc()
+            return reply
+
+        # Fresh namespace and pyplot state for every job
+        namespace = {"df": df, "pd": pd, "plt": plt}
+        sys.stdout = captured = StringIO()
+        try:
+            exec(_sanitize(job["code"]), namespace)
+            reply["output"] = captured.getvalue()
+        except MemoryError:
+            raise _BudgetExceeded("memory")
+        except Exception as e:
+            reply["output"] = repr(e)
+        if _budget_hit:
+            # The code swallowed the limit (bare except, C callback...)
+            raise _BudgetExceeded(_budget_hit)
+    except _BudgetExceeded as e:
+        reply["budget_exceeded"] = e.kind
+        plt.close("all")
+        return reply
+    finally:
+        _disarm_limits()
+        sys.stdout = old_stdout
+
+    figs = [plt.figure(n) for n in plt.get_fignums()]
+    if figs and job.get("chart_path"):
+        try:
+            os.makedirs(os.path.dirname(job["chart_path"]) or ".", exist_ok=True)
+            figs[-1].savefig(job["chart_path"], **job.get("savefig", {}))
+            reply["chart_path"] = job["chart_path"]
+        except Exception as e:
+            reply["output"] += f"\nCould not save chart: {e}"
+    plt.close("all")
+    return reply
+
+
+def _worker_main(conn, cwd, memory_limit, cache_bytes):
+    """Executor process: imports the heavy libraries once, then serves jobs."""
+    os.chdir(cwd)
+    if cwd not in sys.path:
+        sys.path.insert(0, cwd)
+    import pandas as pd
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from data_cache import df_cache
+    # Every worker has its own DataFrame cache: together they share the budget
+    df_cache.max_bytes = cache_bytes
+
+    # Per-job limits surface as _BudgetExceeded inside the running code
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _raise_budget("wall_time"))
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _raise_budget("cpu_time"))
+    if memory_limit and resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard == resource.RLIM_INFINITY or memory_limit < hard:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+    conn.send({"ready": True})
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        reply = _run_job(job, pd, plt)
+        # Cached frames are wanted memory, not growth worth a restart
+        reply["rss"] = max(0, _current_rss() - df_cache.nbytes)
+        conn.send(reply)
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit, cache_bytes):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main,
+                                   args=(child_conn, os.getcwd(), memory_limit, cache_bytes),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+        self.ready = False
+
+    def wait_ready(self):
+        if not self.ready:
+            self.conn.recv()
+            self.ready = True
+
+    def run(self, job, timeout=None):
+        """Returns the job's reply, or None if it didn't answer in `timeout` s."""
+        self.wait_ready()
+        self.conn.send(job)
+        self.runs += 1
+        if timeout is not None and not self.conn.poll(timeout):
+            return None
+        return self.conn.recv()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class ExecutorPool:
+    """
+    Pool of pre-warmed worker processes for LLM-generated code. Each tool
+    call checks out one worker, so concurrent calls never share globals or
+    pyplot state and can run on separate cores. Workers are replaced after
+    `max_runs` jobs or once their memory (not counting their DataFrame
+    cache) exceeds `max_rss_bytes`. Each worker caches DataFrames within
+    an equal share of DF_CACHE_MAX_BYTES; replacing a worker drops its
+    share of the cache.
+
+    `limits` caps every job's wall time and CPU time (seconds) and each
+    worker's address space (bytes); 0 disables a limit. A job that hits
+    one is stopped and gets `budget_exceeded` set in its reply.
+    """
+
+    def __init__(self, size, max_runs, max_rss_bytes, limits=None):
+        self.size = size
+        self.max_runs = max_runs
+        self.max_rss_bytes = max_rss_bytes
+        self.limits = limits or {}
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Spawns the workers and waits until they have imported their
+        libraries (e.g. at server startup) instead of on first use.
+        """
+        self._ensure_started()
+        workers = []
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            for worker in workers:
+                worker.wait_ready()
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def _new_worker(self):
+        cache_bytes = settings.DF_CACHE_MAX_BYTES // max(1, self.size)
+        return _Worker(self._ctx, self.limits.get("memory") or 0, cache_bytes)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(self._new_worker())
+            self._started = True
+            atexit.register(self.shutdown)
+
+    def run(self, job):
+        """Runs one job on an idle worker (waiting for one if all are busy)."""
+        self._ensure_started()
+        worker = self._idle.get()
+        job = {**job, "limits": self.limits}
+        wall_time = self.limits.get("wall_time")
+        reply = None
+        try:
+            # The worker stops itself at `wall_time`; past the grace period we
+            # assume it is stuck inside C code and kill it
+            reply = worker.run(job, timeout=wall_time + 5 if wall_time else None)
+            if reply is None:
+                return {"output": "", "chart_path": None, "rows": None, "error": None,
+                        "budget_exceeded": "wall_time"}
+            return reply
+        except (EOFError, OSError) as e:
+            # The worker died mid-job (crash, OOM kill...)
+            return {"output": "", "chart_path": None, "rows": None,
+                    "error": f"Executor process died: {e!r}", "traceback": "",
+                    "budget_exceeded": None}
+        finally:
+            recycle = (
+                reply is None
+                or reply.get("budget_exceeded") is not None
+                or worker.runs >= self.max_runs
+                or reply.get("rss", 0) > self.max_rss_bytes
+            )
+            if recycle:
+                worker.stop()
+                worker = self._new_worker()
+            self._idle.put(worker)
+
+    def shutdown(self):
+        with self._lock:
+            self._started = False
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+def budget_message(reply, limits):
+    """Tool output for a job stopped by a limit. Starts with BUDGET_EXCEEDED."""
+    kind = reply["budget_exceeded"]
+    limit = limits.get(kind)
+    limit_text = f" of {limit}{_LIMIT_UNITS[kind]}" if limit else ""
+    return (
+        f"{BUDGET_EXCEEDED} ({kind} limit{limit_text}). The code was stopped. "
+        "Rewrite it to be cheaper: use vectorized pandas operations (no iterrows/apply "
+        "over rows, no cross joins), aggregate before plotting, and work on fewer rows/columns."
+    )
+
+
+executor_pool = ExecutorPool(
+    settings.EXECUTOR_POOL_SIZE,
+    settings.EXECUTOR_MAX_RUNS,
+    settings.EXECUTOR_MAX_RSS_BYTES,
+    limits={
+        "wall_time": settings.EXEC_WALL_TIME_SECONDS,
+        "cpu_time": settings.EXEC_CPU_TIME_SECONDS,
+        "memory": settings.EXEC_MEMORY_BYTES,
+    },
+)
@@ -1,8 +1,9 @@
+import asyncio
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import AIMessage, ToolMessage
 from state import AgentState
-from nodes import supervisor_node, csv_worker_node, sql_worker_node, db_chart_worker_node
+from nodes import supervisor_node, csv_worker_node, sql_worker_node, db_chart_worker_node, selected_databases
 from tools import python_analyst, get_sql_tools, db_python_analyst
 
 
@@ -17,11 +18,12 @@ def create_workflow():
     workflow.add_node("csv_tools", ToolNode([python_analyst]))
     workflow.add_node("db_chart_tools", ToolNode([db_python_analyst]))
 
-    def call_sql_tools(state):
-        db_file = next(f for f in state["file_paths"] if f.endswith(".db"))
-        tools = get_sql_tools(db_file)
+    async def call_sql_tools(state, config):
+        db_files = await asyncio.to_thread(selected_databases, state)
+        tools = await asyncio.to_thread(get_sql_tools, db_files[0], db_files[1:])
 
-        tool_result = ToolNode(tools).invoke(state)
+        # Sync tools run in the default executor, off the event loop
+        tool_result = await ToolNode(tools).ainvoke(state, config)
 
         return {
             "messages": tool_result["messages"],
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from config import settings
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    """Too many jobs are already waiting to run."""
+
+
+class JobQueue:
+    """
+    Queries answered in the background by a fixed number of asyncio
+    workers. Every job is stored in SQLite as soon as it is submitted and
+    on each status change, so jobs queued or running when the server
+    stops are picked up again by the next start. Finished jobs are kept
+    for `retention` seconds.
+    """
+
+    def __init__(self, path, workers, max_pending, retention):
+        self.path = path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._queue = None
+        self._tasks = []
+        self._subscribers = {}
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, prompt TEXT, files TEXT, status TEXT,"
+            " result TEXT, error TEXT, created REAL, started REAL, finished REAL)"
+        )
+        return conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(sql, params).fetchall()
+                conn.commit()
+                return rows
+            finally:
+                conn.close()
+
+    async def _query(self, sql, params=()):
+        """_execute in a worker thread: SQLite I/O never blocks the event loop."""
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    @staticmethod
+    def _as_dict(row):
+        job = dict(row)
+        job["files"] = json.loads(job["files"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def get(self, job_id):
+        rows = await self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._as_dict(rows[0]) if rows else None
+
+    async def submit(self, prompt, files):
+        """Stores a new job and queues it. Raises QueueFull."""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running.")
+        if self.max_pending and self._queue.qsize() >= self.max_pending:
+            raise QueueFull(f"{self._queue.qsize()} jobs are already waiting; try again later.")
+        job_id = uuid.uuid4().hex
+        await self._query(
+            "INSERT INTO jobs (id, prompt, files, status, created) VALUES (?, ?, ?, ?, ?)",
+            (job_id, prompt, json.dumps(files), QUEUED, time.time()),
+        )
+        self._queue.put_nowait(job_id)
+        return await self.get(job_id)
+
+    async def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        await self._query(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        job = await self.get(job_id)
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(job)
+        return job
+
+    def subscribe(self, job_id):
+        """Queue receiving the job's state each time its status changes."""
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id, queue):
+        subscribers = self._subscribers.get(job_id, set())
+        subscribers.discard(queue)
+        if not subscribers:
+            self._subscribers.pop(job_id, None)
+
+    async def start(self, run):
+        """
+        Starts the workers. `run(prompt, files)` is awaited for each job
+        and returns its result (anything JSON serializable).
+        """
+        self._queue = asyncio.Queue()
+        if self.retention:
+            await self._query("DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?",
+                          (*FINISHED, time.time() - self.retention))
+        # Jobs interrupted by the last shutdown run again from the start
+        await self._query("UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING))
+        pending = await self._query("SELECT id FROM jobs WHERE status = ? ORDER BY created", (QUEUED,))
+        for row in pending:
+            self._queue.put_nowait(row["id"])
+        if pending:
+            print(f"DEBUG: Resuming {len(pending)} queued job(s)")
+        self._tasks = [asyncio.create_task(self._worker(run)) for _ in range(max(1, self.workers))]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _process(self, job_id, run):
+        job = await self.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        await self._update(job_id, status=RUNNING, started=time.time())
+        try:
+            result = await run(job["prompt"], job["files"])
+        except asyncio.CancelledError:
+            raise  # Left RUNNING, so the next start queues it again
+        except Exception as e:
+            await self._update(job_id, status=FAILED, error=str(e), finished=time.time())
+        else:
+            await self._update(job_id, status=DONE, result=json.dumps(result, default=str),
+                               finished=time.time())
+
+    async def _fail_unfinished(self, job_id, error):
+        """Marks a job failed unless its final status was already stored."""
+        await self._query(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND status NOT IN (?, ?)",
+            (FAILED, error, time.time(), job_id, *FINISHED),
+        )
+        job = await self.get(job_id)
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(job)
+
+    async def _worker(self, run):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id, run)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Bookkeeping failed (e.g. the jobs database stayed locked);
+                # this worker must keep serving the queue
+                print(f"WARNING: Job {job_id} failed outside its run: {e}")
+                try:
+                    await self._fail_unfinished(job_id, f"Job bookkeeping failed: {e}")
+                except Exception as e:
+                    print(f"WARNING: Could not mark job {job_id} as failed: {e}")
+            finally:
+                self._queue.task_done()
+
+job_queue = JobQueue(
+    settings.JOB_QUEUE_PATH,
+    settings.JOB_WORKERS,
+    settings.JOB_MAX_PENDING,
+    settings.JOB_RETENTION_SECONDS,
+)
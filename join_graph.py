@@ -0,0 +1,118 @@
+import re
+from collections import deque
+from catalog import schema_catalog
+from schema_index import load_schema_index, rank_tables, tokenize
+from sqlite_pool import readonly_connection
+
+_ID_COLUMN = re.compile(r"^(.+?)_?id$", re.I)
+
+
+def _quote(name):
+    return name if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name) else f"[{name}]"
+
+
+def build_join_graph(db_path):
+    """
+    {table: [(other table, join condition), ...]} for a database: its
+    declared foreign keys, plus `*ID` columns inferred to reference the
+    table that has that column as its primary key (or is named after it).
+    """
+    with readonly_connection(db_path) as conn:
+        tables = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        columns, primary_keys, declared = {}, {}, []
+        for table in tables:
+            quoted = table.replace('"', '""')
+            info = conn.execute(f'PRAGMA table_info("{quoted}")').fetchall()
+            columns[table] = [col[1] for col in info]
+            primary_keys[table] = [col[1] for col in sorted(info, key=lambda c: c[5]) if col[5]]
+            for fk in conn.execute(f'PRAGMA foreign_key_list("{quoted}")'):
+                target, source_col, target_col = fk[2], fk[3], fk[4]
+                if target in tables:
+                    declared.append((table, source_col, target, target_col))
+
+    # Fill in foreign keys pointing at the target's primary key
+    edges = set()
+    for table, source_col, target, target_col in declared:
+        if target_col is None:
+            target_pk = primary_keys.get(target) or []
+            if len(target_pk) != 1:
+                continue
+            target_col = target_pk[0]
+        edges.add((table, source_col, target, target_col))
+
+    # Inferred: Orders.CustomerID -> Customers.CustomerID
+    owners = {}
+    for table in tables:
+        pk = primary_keys[table]
+        for column in columns[table]:
+            match = _ID_COLUMN.match(column)
+            if not match:
+                continue
+            named_after = tokenize(match.group(1)) == tokenize(table)
+            if pk == [column] or (not pk and named_after):
+                owners.setdefault(column.lower(), []).append((table, column))
+    for table in tables:
+        for column in columns[table]:
+            for owner, owner_col in owners.get(column.lower(), []):
+                if owner != table and not any(
+                    {e[0], e[2]} == {table, owner} and column.lower() in (e[1].lower(), e[3].lower())
+                    for e in edges
+                ):
+                    edges.add((table, column, owner, owner_col))
+
+    graph = {table: [] for table in tables}
+    for table, column, other, other_col in sorted(edges):
+        if table == other:
+            continue  # Self references (e.g. Employees.ReportsTo) aren't join paths
+        condition = f"{_quote(table)}.{column} = {_quote(other)}.{other_col}"
+        graph[table].append((other, condition))
+        graph[other].append((table, condition))
+    return graph
+
+
+def shortest_join_path(graph, start, end):
+    """Join conditions linking `start` to `end` through the fewest tables, or None."""
+    previous = {start: None}
+    queue = deque([start])
+    while queue:
+        table = queue.popleft()
+        if table == end:
+            conditions = []
+            while previous[table] is not None:
+                table, condition = previous[table]
+                conditions.append(condition)
+            return list(reversed(conditions))
+        for other, condition in graph.get(table, []):
+            if other not in previous:
+                previous[other] = (table, condition)
+                queue.append(other)
+    return None
+
+
+def mentioned_tables(tables, question, limit=4):
+    """Tables whose name appears in the question ("orders", "order details")."""
+    words = set(tokenize(question))
+    named = [t for t in tables if tokenize(t) and set(tokenize(t)) <= words]
+    return named[:limit]
+
+
+def join_paths_for(db_path, question, limit=4):
+    """
+    Prompt text with the shortest join paths between the tables a question
+    is about, or "" if fewer than two tables are involved.
+    """
+    graph = schema_catalog.get(db_path, build_join_graph)
+    tables = mentioned_tables(list(graph), question, limit)
+    if len(tables) < 2:
+        ranked = rank_tables(schema_catalog.get(db_path, load_schema_index), question)
+        tables += [t for t in ranked if t in graph and t not in tables][:max(0, 2 - len(tables))]
+
+    lines = []
+    for i, start in enumerate(tables):
+        for end in tables[i + 1:]:
+            path = shortest_join_path(graph, start, end)
+            if path:
+                lines.append(f"{_quote(start)} -> {_quote(end)}: " + ", then ".join(path))
+    return "\n".join(lines)
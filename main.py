@@ -1,14 +1,42 @@
 import shutil
 import os
-from typing import List
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from config import settings
 from graph import app_graph
+from streaming import graph_events, sse
+from jobs import job_queue, QueueFull, FINISHED
+from batch import run_batch, normalize_prompt
+from single_flight import query_flights
+from executor import executor_pool
+from data_cache import df_cache, ingest_csv, file_fingerprint
+from profiler import build_profile
+from schema_index import build_schema_index
+from csv_tables import ensure_csv_database
+from join_graph import build_join_graph
+from catalog import schema_catalog
 from langchain_core.messages import HumanMessage
 
-app = FastAPI(title="Multi-Source AI Agent")
+@asynccontextmanager
+async def lifespan(app):
+    # Spawn the code executors now so the first CSV/chart question doesn't
+    # wait for them to import pandas and matplotlib
+    await asyncio.to_thread(executor_pool.start)
+    # Background job workers (POST /jobs), resuming jobs left by a restart
+    await job_queue.start(answer_query)
+    yield
+    await job_queue.stop()
+    await asyncio.to_thread(executor_pool.shutdown)
+
+
+app = FastAPI(title="Multi-Source AI Agent", lifespan=lifespan)
 
 # In-memory storage for the current session's files. 
 # Note: For production, use a database or Redis to track this per user.
@@ -30,6 +58,16 @@ class QueryRequest(BaseModel):
     prompt: str
 
 
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    prompt: str
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    concurrency: Optional[int] = None
+
+
 @app.get("/files")
 async def list_files():
     """
@@ -41,6 +79,46 @@ async def list_files():
     return {"files": session_files}
 
 
+def save_upload(file, file_path):
+    """Writes an uploaded file and builds its caches, indexes and profile."""
+    # Frames of a replaced file (loaded here for profiling) are dead weight
+    df_cache.invalidate(file_path)
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    # Ingestion: build the columnar copy now so queries skip CSV parsing
+    if file.filename.lower().endswith(".csv"):
+        try:
+            ingest_csv(file_path)
+        except Exception as e:
+            print(f"WARNING: Columnar ingestion failed for {file.filename}: {e}")
+        # SQL copy lets database questions join against this CSV
+        try:
+            sql_copy = ensure_csv_database(file_path)
+            if sql_copy:
+                build_schema_index(sql_copy)
+        except Exception as e:
+            print(f"WARNING: SQL table for {file.filename} failed: {e}")
+
+    # Relevance index and join graph feed each SQL prompt
+    if file.filename.lower().endswith(".db"):
+        try:
+            build_schema_index(file_path)
+            schema_catalog.get(file_path, build_join_graph)
+        except Exception as e:
+            print(f"WARNING: Schema indexing failed for {file.filename}: {e}")
+
+    # Statistics profile lets the supervisor answer trivial questions
+    try:
+        build_profile(file_path)
+    except Exception as e:
+        print(f"WARNING: Profiling failed for {file.filename}: {e}")
+
+    # Queries run in the executors, whose caches hold the frames; keeping
+    # one here too would add to DF_CACHE_MAX_BYTES instead of sharing it
+    df_cache.invalidate(file_path)
+
+
 @app.post("/upload")
 async def upload_files(files: List[UploadFile] = File(...)):
     """
@@ -52,9 +130,9 @@ async def upload_files(files: List[UploadFile] = File(...)):
     for file in files:
         file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
         try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
+            # Copying and indexing block, so they run in a worker thread
+            await run_in_threadpool(save_upload, file, file_path)
+
             if file.filename not in session_files:
                 session_files.append(file.filename)
             uploaded_names.append(file.filename)
@@ -68,11 +146,8 @@ async def upload_files(files: List[UploadFile] = File(...)):
 
 
 
-@app.post("/query")
-async def process_query(request: QueryRequest):
-    """
-    Query the agent using files currently in the uploads folder.
-    """
+def query_files():
+    """Files a new query runs over: everything in the uploads folder."""
     available_files = get_local_files()
 
     if not available_files:
@@ -80,29 +155,155 @@ async def process_query(request: QueryRequest):
             status_code=400,
             detail="No data files found in the uploads directory."
         )
+    return available_files
 
+
+def prepare_query(prompt, available_files):
+    """Initial LangGraph state and config for a prompt over some files."""
     # Prepare the Initial State for LangGraph
     initial_state = {
-        "messages": [HumanMessage(content=request.prompt)],
+        "messages": [HumanMessage(content=prompt)],
         "file_paths": available_files,
         "active_worker": "supervisor"
     }
+    # thread_id: user_session_1 keeps a single conversation thread
+    config = {"configurable": {"thread_id": "user_session_1"},
+              "recursion_limit": 100}
+    return initial_state, config
 
-    try:
-        # thread_id: user_session_1 keeps a single conversation thread
-        config = {"configurable": {"thread_id": "user_session_1"},
-                  "recursion_limit": 100}
-        
-        final_output = app_graph.invoke(initial_state, config=config)
-        
+
+def query_key(prompt, available_files):
+    """Identifies a query: its normalized prompt and the versions of its files."""
+    versions = []
+    for name in sorted(available_files):
+        try:
+            versions.append(file_fingerprint(os.path.join(settings.UPLOAD_DIR, name)))
+        except OSError:
+            versions.append((name, None))
+    return normalize_prompt(prompt), tuple(versions)
+
+
+async def answer_query(prompt, available_files):
+    """
+    Runs the graph for a prompt and returns the /query response. Identical
+    queries arriving while one is running share its run and its answer.
+    """
+    async def run():
+        initial_state, config = prepare_query(prompt, available_files)
+        final_output = await app_graph.ainvoke(initial_state, config=config)
         return {
-            "query": request.prompt,
+            "query": prompt,
             "active_files": available_files,
             "answer": final_output["messages"][-1].content
         }
+
+    response = await query_flights.do(query_key(prompt, available_files), run)
+    return {**response, "query": prompt}
+
+
+@app.post("/query")
+async def process_query(request: QueryRequest):
+    """
+    Query the agent using files currently in the uploads folder.
+    """
+    available_files = query_files()
+
+    try:
+        return await answer_query(request.prompt, available_files)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent Error: {str(e)}")
 
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """
+    Same as /query, but streams server-sent events while the agent works:
+    routing, generated SQL/code, tool timings, answer tokens and charts.
+    The last event is `done` (the /query response) or `error`.
+    """
+    available_files = query_files()
+    initial_state, config = prepare_query(request.prompt, available_files)
+
+    async def events():
+        try:
+            async for event, data in graph_events(app_graph, initial_state, config):
+                if event == "done":
+                    data = {"query": request.prompt, "active_files": available_files, **data}
+                yield sse(event, data)
+        except Exception as e:
+            yield sse("error", {"detail": f"Agent Error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/batch")
+async def batch_query(request: BatchRequest):
+    """
+    Answers many prompts in one call, streamed as JSON lines in the order
+    they finish: id, prompt, target file, answer (or error), start offset
+    and duration in seconds. Identical prompts run once (`duplicate_of`
+    names the item whose run they share).
+    """
+    available_files = query_files()
+    items = [(item.id or str(n), item.prompt) for n, item in enumerate(request.items, 1)]
+    concurrency = request.concurrency or settings.BATCH_CONCURRENCY
+    concurrency = max(1, min(concurrency, settings.BATCH_MAX_CONCURRENCY))
+
+    async def lines():
+        async for result in run_batch(items, available_files, answer_query, concurrency):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: QueryRequest):
+    """
+    Queues a query and returns its job id right away. The answer is
+    fetched from GET /jobs/{id} (or pushed over /jobs/{id}/ws) once ready.
+    """
+    available_files = query_files()
+    try:
+        job = await job_queue.submit(request.prompt, available_files)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job["id"], "status": job["status"]}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a job and, once done, its /query response (or error)."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+
+@app.websocket("/jobs/{job_id}/ws")
+async def watch_job(websocket: WebSocket, job_id: str):
+    """Sends the job's state now and on every status change until it finishes."""
+    await websocket.accept()
+    updates = job_queue.subscribe(job_id)
+    try:
+        job = await job_queue.get(job_id)
+        if job is None:
+            await websocket.send_json({"error": f"Job {job_id} not found."})
+        while job is not None:
+            await websocket.send_json(job)
+            if job["status"] in FINISHED:
+                break
+            job = await updates.get()
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        job_queue.unsubscribe(job_id, updates)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
\ No newline at end of file
@@ -1,24 +1,118 @@
 import pandas as pd
 import os
+import asyncio
+import sqlite3
 from langchain_core.messages import SystemMessage, ToolMessage, AIMessage, HumanMessage
-from config import llm
+from config import llm, settings
 from tools import python_analyst, get_sql_tools, db_python_analyst
-
-def get_csv_metadata(file_path):
+from chunked import CHUNKED_API_HINT, is_large_csv
+from csv_schema import read_csv_typed, plain_categories
+from profiler import answer_from_profiles
+from catalog import schema_catalog, fit_to_budget
+from schema_index import load_schema_index, rank_tables
+from join_graph import join_paths_for
+from db_router import route_databases, attach_list
+from executor import BUDGET_EXCEEDED
+from sql_results import sql_result_store
+
+def get_csv_metadata(file_path, sample_rows=7):
     """Helper to extract a tiny summary of a CSV to save tokens."""
     try:
-        # Only read the first 7 rows to keep the prompt small
-        df = pd.read_csv(file_path, nrows=7)
+        # Only read the first few rows to keep the prompt small
+        # Same dtypes as the `df` generated code gets (see executor._load_dataframe)
+        df = plain_categories(read_csv_typed(file_path, nrows=max(sample_rows, 1)))
+        columns = ", ".join(f"{c} ({t})" for c, t in df.dtypes.astype(str).items())
         summary = (
             f"File: {os.path.basename(file_path)}\n"
-            f"Columns: {list(df.columns)}\n"
-            f"Sample Data:\n{df.to_string(index=False)}"
+            f"Columns: {columns}"
         )
+        if sample_rows:
+            summary += f"\nSample Data:\n{df.head(sample_rows).to_string(index=False)}"
         return summary
     except Exception as e:
         return f"Error reading {file_path}: {str(e)}"
 
-def supervisor_node(state):
+def get_db_metadata(db_path, sample_rows=3):
+    """Same as get_csv_metadata, for every table of a SQLite database."""
+    tables = {}
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    try:
+        names = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        for name in names:
+            quoted = name.replace('"', '""')
+            info = conn.execute(f'PRAGMA table_info("{quoted}")').fetchall()
+            columns = ", ".join(f"{col[1]} {col[2]}".strip() for col in info)
+            summary = f"Table [{name}]: {columns}"
+            # Binary columns only add noise to the sample
+            readable = [col[1].replace('"', '""') for col in info if "BLOB" not in (col[2] or "").upper()]
+            if sample_rows and readable:
+                select = ", ".join(f'"{c}"' for c in readable)
+                sample = pd.read_sql_query(f'SELECT {select} FROM "{quoted}" LIMIT {int(sample_rows)}', conn)
+                if sample.empty:
+                    summary += "\nSample Data: (empty table)"
+                else:
+                    summary += f"\nSample Data:\n{sample.to_string(index=False, max_colwidth=40)}"
+            tables[name] = summary
+    finally:
+        conn.close()
+    return tables
+
+def csv_catalog(csv_files):
+    """Columns, dtypes and sample rows of the given CSVs, within the token budget."""
+    blocks = []
+    for f in csv_files:
+        path = os.path.join("uploads", f)
+        blocks.append((
+            schema_catalog.get(path, get_csv_metadata, settings.CATALOG_SAMPLE_ROWS),
+            schema_catalog.get(path, get_csv_metadata, 0),
+        ))
+    return fit_to_budget(blocks)
+
+def db_catalog(db_path, question=None, budget=None):
+    """
+    Table schemas and sample rows of a database, within the token budget.
+    Given a question, databases with many tables only show the ones most
+    relevant to it (BM25 over table/column names and sample values).
+    """
+    full = schema_catalog.get(db_path, get_db_metadata, settings.CATALOG_SAMPLE_ROWS)
+    compact = schema_catalog.get(db_path, get_db_metadata, 0)
+    tables = list(full)
+    note = ""
+    if question and len(tables) > settings.SCHEMA_TOP_K:
+        ranked = [t for t in rank_tables(schema_catalog.get(db_path, load_schema_index), question) if t in full]
+        if ranked:
+            tables = ranked[:settings.SCHEMA_TOP_K]
+            others = [t for t in full if t not in tables]
+            note = "\nOther tables (inspect with sql_db_schema if needed): " + ", ".join(others[:50])
+            if len(others) > 50:
+                note += f" and {len(others) - 50} more"
+    return fit_to_budget([(full[t], compact[t]) for t in tables], budget) + note
+
+def selected_databases(state):
+    """Databases for this question: picked by the supervisor, or routed now."""
+    if state.get("db_files"):
+        return state["db_files"]
+    db_files = [f for f in state["file_paths"] if f.lower().endswith(".db")]
+    return route_databases(state["messages"][0].content, db_files)
+
+def budget_retry_allowed(state):
+    """
+    True when the last tool run was stopped by an execution limit for the
+    first time, so the worker should ask for cheaper code instead of
+    summarizing the failure.
+    """
+    last_msg = state["messages"][-1]
+    if not (isinstance(last_msg, ToolMessage) and isinstance(last_msg.content, str)
+            and last_msg.content.startswith(BUDGET_EXCEEDED)):
+        return False
+    stopped = [m for m in state["messages"]
+               if isinstance(m, ToolMessage) and isinstance(m.content, str)
+               and m.content.startswith(BUDGET_EXCEEDED)]
+    return len(stopped) == 1
+
+async def supervisor_node(state):
     """Safely extracts text and routes the user based on query and files."""
     if not state.get("messages"):
         return {"active_worker": "general"}
@@ -35,26 +129,41 @@ def supervisor_node(state):
     query = text_query.lower()
     files = state.get("file_paths", [])
 
+    # Row counts, min/max/mean etc. come straight from the upload-time profile
+    profile_answer = await asyncio.to_thread(answer_from_profiles, text_query, files)
+    if profile_answer:
+        return {"active_worker": "general", "messages": [AIMessage(content=profile_answer)]}
+
     has_db = any(f.lower().endswith('.db') for f in files)
     has_csv = any(f.lower().endswith('.csv') for f in files)
 
+    # Questions spanning a database and a CSV become one SQL query over both
+    if has_db and has_csv:
+        sources = await asyncio.to_thread(route_databases, text_query, files)
+        if any(f.lower().endswith(".csv") for f in sources) and any(f.lower().endswith(".db") for f in sources):
+            sources.sort(key=lambda f: not f.lower().endswith(".db"))  # a real database is the main one
+            return {"active_worker": "sql_worker", "db_files": sources}
+
     if has_db and any(word in query for word in ["sql", "database", "table", "query"]):
-        return {"active_worker": "sql_worker"}
+        db_files = [f for f in files if f.lower().endswith(".db")]
+        db_files = await asyncio.to_thread(route_databases, text_query, db_files)
+        return {"active_worker": "sql_worker", "db_files": db_files}
     elif has_csv:
         return {"active_worker": "csv_worker"}
     
     return {"active_worker": "general"}
 
 
-def csv_worker_node(state):
-    # Only get column names, NOT sample data, to prevent the 'dict' hallucination
+async def csv_worker_node(state):
     csv_files = [f for f in state.get("file_paths", []) if f.lower().endswith('.csv')]
-    # Simpler metadata: just columns
-    metadata = "\n".join([f"File: {f}" for f in csv_files])
+    # Columns, dtypes and a few sample rows (cached per file version) so the
+    # model doesn't have to guess column names
+    metadata = await asyncio.to_thread(csv_catalog, csv_files)
 
     last_msg = state["messages"][-1]
+    retry_cheaper = budget_retry_allowed(state)
     
-    if isinstance(last_msg, ToolMessage):
+    if isinstance(last_msg, ToolMessage) and not retry_cheaper:
 
         if not isinstance(last_msg.content, str):
             raise RuntimeError("Tool output is not a string. Tool normalization failed.")
@@ -80,7 +189,7 @@ def csv_worker_node(state):
         - Respond in 1-2 sentences.
         """
 
-        response = llm.invoke([SystemMessage(content=prompt)])
+        response = await llm.ainvoke([SystemMessage(content=prompt)])
         
         # If there's a chart, append the path info to the response
         if chart_path:
@@ -93,6 +202,13 @@ def csv_worker_node(state):
     else:
         # PHASE: CODE GENERATION
         # We explicitly tell it df is a PANDAS DATAFRAME
+        # (unless the file is too large and gets streamed in chunks)
+        large_files = [f for f in csv_files if is_large_csv(os.path.join("uploads", f))]
+        if large_files:
+            metadata += f"\n        NOTE: For {', '.join(large_files)}: {CHUNKED_API_HINT}"
+        if retry_cheaper:
+            metadata += f"\n        NOTE: Your previous code was stopped: {last_msg.content}"
+
         prompt = f"""You are a Python Data Analyst. 
         Available Files: {metadata}
         
@@ -103,33 +219,73 @@ def csv_worker_node(state):
         2. Decide which CSV file is relevant and use ONLY that file.
         3. The pandas DataFrame is already loaded as `df`.
         4. Use print() to output the final numeric/text result.
-        5. DO NOT explain.
-        6. DO NOT write Python code as plain text.
-        7. Output ONLY a tool call.
+        5. Sample Data is only a preview: use the exact column names shown, never pass data to the tool.
+        6. DO NOT explain.
+        7. DO NOT write Python code as plain text.
+        8. Output ONLY a tool call.
         """
         agent = llm.bind_tools([python_analyst])
 
         # Important: We only pass the necessary history to avoid 'Context Pollution'
         messages = [SystemMessage(content=prompt)] + state["messages"]
-        response = agent.invoke(messages)
+        response = await agent.ainvoke(messages)
 
         if not response.tool_calls:
             raise RuntimeError("CSV worker failed to call python_analyst tool.")
 
         return {"messages": [response]}
 
-def sql_worker_node(state):
+def stored_result_shape(db_files, sql_query):
+    """Columns and row count of a stored SQL result, or None (file reads, run off the event loop)."""
+    db_path = os.path.join("uploads", db_files[0])
+    return sql_result_store.describe(db_path, sql_query, attach_list(db_files))
+
+# Tool calls one SQL question may use, including retries after errors
+MAX_SQL_TOOL_STEPS = 4
+
+def sql_prompt_context(db_files, question):
+    """Schema text and join paths for the SQL prompt (database reads, run off the event loop)."""
+    db_path = os.path.join("uploads", db_files[0])
+    attach = attach_list(db_files)
+
+    # Known join keys between the tables the question is about
+    join_paths = join_paths_for(db_path, question)
+    join_section = f"JOIN PATHS (use exactly these join keys):\n    {join_paths}\n" if join_paths else ""
+
+    # Other databases the question needs are attached to the same connection
+    schema = db_catalog(db_path, question, settings.CATALOG_TOKEN_BUDGET // len(db_files))
+    for alias, path in attach:
+        schema += (f"\n\nATTACHED DATABASE {os.path.basename(path)} - prefix its tables with {alias}. "
+                   f"(e.g. {alias}.[Table Name]):\n"
+                   + db_catalog(path, question, settings.CATALOG_TOKEN_BUDGET // len(db_files)))
+        attached_paths = join_paths_for(path, question)
+        if attached_paths:
+            join_section += f"JOIN PATHS in {alias} (prefix the tables with {alias}.):\n    {attached_paths}\n"
+    if attach:
+        join_section += ("Tables from different databases can be joined in one query; "
+                         "match them on their shared key columns.\n")
+    return schema, join_section
+
+async def sql_worker_node(state):
     """SQL Agent: Handles queries and detects chart intent."""
-    db_file = next(f for f in state["file_paths"] if f.endswith('.db'))
-    db_path = os.path.join("uploads", db_file)
-    
-    tools = get_sql_tools(db_path)
+    db_files = await asyncio.to_thread(selected_databases, state)
+    db_file = db_files[0]
+
+    tools = await asyncio.to_thread(get_sql_tools, db_file, db_files[1:])
     agent = llm.bind_tools(tools)
 
     last_msg = state["messages"][-1]
 
+    # Schema lookups and rejected queries go back to the model for another try
+    needs_retry = isinstance(last_msg, ToolMessage) and (
+        last_msg.name != "sql_db_query" or str(last_msg.content).startswith("Error")
+    )
+    tool_steps = sum(isinstance(m, ToolMessage) for m in state["messages"])
+    if needs_retry and tool_steps >= MAX_SQL_TOOL_STEPS:
+        needs_retry = False
+
     # Check if we just got tool results back
-    if isinstance(last_msg, ToolMessage):
+    if isinstance(last_msg, ToolMessage) and not needs_retry:
         user_query = state["messages"][0].content.lower()
 
         # Detect chart/visualization keywords
@@ -157,7 +313,7 @@ def sql_worker_node(state):
 
         # No chart intent - just summarize the SQL results
         prompt = "You have the query results. Summarize the answer for the user in a clear and concise way."
-        response = llm.invoke([SystemMessage(content=prompt)] + state["messages"])
+        response = await llm.ainvoke([SystemMessage(content=prompt)] + state["messages"])
         return {"messages": [response]}
 
     # Initial query - generate SQL
@@ -172,14 +328,22 @@ def sql_worker_node(state):
     # If it's a chart request, we need MORE data (not limited to 10 rows)
     limit_instruction = "Do NOT limit rows." if has_chart_intent else "Always limit rows to 10 unless a larger result is explicitly needed."
 
+    schema, join_section = await asyncio.to_thread(
+        sql_prompt_context, db_files, state['messages'][0].content
+    )
+
     prompt = f"""You are a SQL Expert.
     You are connected to the database: {db_file}
 
+    SCHEMA:
+    {schema}
+
+    {join_section}
     TASK: {state['messages'][0].content}
 
     RULES:
     1. Always call the 'sql_db_query' tool.
-    2. Inspect tables and columns first if needed.
+    2. Use the schema above; call 'sql_db_schema' or 'sql_db_list_tables' only if something you need is not shown.
     3. Execute queries to answer the user's request directly.
     4. ALWAYS use table aliases and fully qualify column names (e.g., p.UnitPrice, od.Quantity) to avoid ambiguity.
     5. Example: SELECT p.ProductName, SUM(od.UnitPrice * od.Quantity) FROM [Order Details] od JOIN Products p ON od.ProductID = p.ProductID
@@ -189,12 +353,12 @@ def sql_worker_node(state):
     """
     
     messages = [SystemMessage(content=prompt)] + state["messages"]
-    response = agent.invoke(messages)
+    response = await agent.ainvoke(messages)
 
     updates = {"messages": [response]}
 
     # Store the SQL query for potential chart generation
-    if isinstance(response, AIMessage) and response.tool_calls:
+    if isinstance(response, AIMessage) and response.tool_calls and response.tool_calls[0]["name"] == "sql_db_query":
         sql_query = response.tool_calls[0]["args"]["query"]
         updates["last_sql_query"] = sql_query
         print(f"🔍 DEBUG: Stored SQL query: {sql_query}")
@@ -202,7 +366,7 @@ def sql_worker_node(state):
     return updates
 
 
-def db_chart_worker_node(state):
+async def db_chart_worker_node(state):
     """
     Uses the previously generated SQL query to load data via pandas
     and generate charts using Python.
@@ -217,14 +381,17 @@ def db_chart_worker_node(state):
         raise RuntimeError("No SQL query found for chart generation.")
 
     # 2️⃣ Identify the DB file
-    db_file = next(f for f in state["file_paths"] if f.endswith(".db"))
+    db_files = await asyncio.to_thread(selected_databases, state)
+    db_file = ", ".join(db_files)
 
     last_msg = state["messages"][-1]
     
     print(f"🎨 DEBUG: Last message type: {type(last_msg).__name__}")
 
     # If we just executed the chart tool, summarize the result
-    if isinstance(last_msg, ToolMessage) and state.get("chart_code_generated"):
+    retry_cheaper = budget_retry_allowed(state)
+
+    if isinstance(last_msg, ToolMessage) and state.get("chart_code_generated") and not retry_cheaper:
         print(f"🎨 DEBUG: Processing chart tool result")
         prompt = f"""
         You are a data analyst.
@@ -237,12 +404,21 @@ def db_chart_worker_node(state):
         - If there's an error, explain it clearly.
         - Keep it brief and helpful.
         """
-        response = llm.invoke([SystemMessage(content=prompt)])
+        response = await llm.ainvoke([SystemMessage(content=prompt)])
         return {"messages": [response], "chart_code_generated": False}
 
     # 3️⃣ Generate chart code (first time in chart worker)
     print(f"🎨 DEBUG: Generating chart code")
-    
+
+    # The SQL tool already fetched these rows; show their shape instead of guessing
+    stored = await asyncio.to_thread(stored_result_shape, db_files, sql_query)
+    if stored:
+        columns, rows = stored
+        df_info = f"df has {rows} rows and these columns: " + ", ".join(f"{c} ({t})" for c, t in columns)
+        print(f"🎨 DEBUG: Reusing stored SQL result ({rows} rows)")
+    else:
+        df_info = ""
+
     prompt = f"""
 You are a Python data visualization expert.
 
@@ -250,6 +426,7 @@ DATABASE: {db_file}
 SQL QUERY: {sql_query}
 
 The data from this SQL query will be loaded into a pandas DataFrame named `df`.
+{df_info}
 
 USER REQUEST: {state["messages"][0].content}
 
@@ -274,13 +451,15 @@ CRITICAL INSTRUCTIONS:
 
 DO NOT explain anything. ONLY call the tool.
 """
+    if retry_cheaper:
+        prompt += f"\nNOTE: Your previous code was stopped: {last_msg.content}\n"
 
     # 4️⃣ Bind the db_python_analyst tool
     agent = llm.bind_tools([db_python_analyst])
 
     # 5️⃣ Invoke agent
     messages = [SystemMessage(content=prompt)]
-    response = agent.invoke(messages)
+    response = await agent.ainvoke(messages)
     
     print(f"🎨 DEBUG: Agent response type: {type(response).__name__}")
     print(f"🎨 DEBUG: Has tool_calls: {hasattr(response, 'tool_calls') and bool(response.tool_calls)}")
@@ -0,0 +1,296 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+import pandas as pd
+from config import settings
+from csv_schema import SCHEMA_VERSION
+from data_cache import df_cache, load_csv
+from chunked import is_large_csv, iter_csv_chunks
+
+_building = set()
+_building_lock = threading.Lock()
+
+
+def profile_path(file_path):
+    """Location of the statistics profile of a CSV or .db file."""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, ".cache", f"{name}.profile.json")
+
+
+def _plain(value):
+    """JSON-friendly version of a pandas/numpy scalar."""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (int, float, str, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class _ColumnStats:
+    """Accumulates one column's statistics over any number of chunks."""
+
+    def __init__(self):
+        self.dtype = None
+        self.numeric = False
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.value_counts = pd.Series(dtype="int64")  # None once too many distinct values
+
+    def update(self, series):
+        if self.dtype is None:
+            self.dtype = str(series.dtype)
+            self.numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        values = series.dropna()
+        self.nulls += int(len(series) - len(values))
+        self.count += len(values)
+        if len(values) == 0:
+            return
+
+        if self.numeric or pd.api.types.is_datetime64_any_dtype(values):
+            low, high = values.min(), values.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+        if self.numeric:
+            # float64 even for narrower stored columns, or large totals drift
+            self.total += float(values.to_numpy(dtype="float64").sum())
+
+        if self.value_counts is not None:
+            counts = values.value_counts()
+            counts = counts[counts > 0]  # categoricals list unused categories
+            self.value_counts = self.value_counts.add(counts, fill_value=0)
+            if len(self.value_counts) > settings.PROFILE_MAX_DISTINCT:
+                self.value_counts = None
+
+    def to_dict(self):
+        stats = {
+            "dtype": self.dtype,
+            "count": self.count,
+            "nulls": self.nulls,
+            "min": _plain(self.min),
+            "max": _plain(self.max),
+            "mean": self.total / self.count if self.numeric and self.count else None,
+            "distinct": len(self.value_counts) if self.value_counts is not None else None,
+            "top": None,
+        }
+        if self.value_counts is not None:
+            top = self.value_counts.sort_values(ascending=False).head(settings.PROFILE_TOP_VALUES)
+            stats["top"] = [[_plain(k), int(v)] for k, v in top.items()]
+        return stats
+
+
+def _profile_chunks(chunks):
+    rows = 0
+    columns = {}
+    for chunk in chunks:
+        rows += len(chunk)
+        for column in chunk.columns:
+            columns.setdefault(column, _ColumnStats()).update(chunk[column])
+    return {"rows": rows, "columns": {str(c): s.to_dict() for c, s in columns.items()}}
+
+
+def _stamp(file_path):
+    stat = os.stat(file_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns,
+            "schema_version": SCHEMA_VERSION}
+
+
+def _db_tables(conn):
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def build_profile(file_path):
+    """
+    Computes and saves the statistics profile of a CSV (one table) or a
+    SQLite database (every table): row counts, nulls, min/max/mean,
+    distinct counts and top values per column.
+    """
+    stamp = _stamp(file_path)
+    tables = {}
+    if file_path.lower().endswith(".csv"):
+        if is_large_csv(file_path):
+            chunks = iter_csv_chunks(file_path)
+        else:
+            chunks = [load_csv(file_path)]
+        tables[os.path.basename(file_path)] = _profile_chunks(chunks)
+    else:
+        conn = sqlite3.connect(f"file:{os.path.abspath(file_path)}?mode=ro", uri=True)
+        try:
+            for table in _db_tables(conn):
+                quoted = table.replace('"', '""')
+                chunks = pd.read_sql_query(f'SELECT * FROM "{quoted}"', conn,
+                                           chunksize=settings.CSV_CHUNK_ROWS)
+                tables[table] = _profile_chunks(chunks)
+        finally:
+            conn.close()
+
+    profile = {**stamp, "tables": tables}
+    target = profile_path(file_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(profile, f, indent=2, default=str)
+    os.replace(tmp_path, target)
+    return profile
+
+
+def load_profile(file_path):
+    """Saved profile of this version of `file_path`, or None."""
+    target = profile_path(file_path)
+    if not os.path.exists(target):
+        return None
+    try:
+        with open(target) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(profile.get(k) != v for k, v in _stamp(file_path).items()):
+        return None
+    return profile
+
+
+def ensure_profile_async(file_path):
+    """Builds a missing or stale profile in the background."""
+    key = os.path.abspath(file_path)
+    with _building_lock:
+        if key in _building:
+            return
+        _building.add(key)
+
+    def run():
+        try:
+            build_profile(file_path)
+        except Exception as e:
+            print(f"WARNING: Profiling {file_path} failed: {e}")
+        finally:
+            # Only the executors keep frames cached (see main.save_upload)
+            df_cache.invalidate(file_path)
+            with _building_lock:
+                _building.discard(key)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+# ---------------------------------------------------------------------------
+# Answering trivial questions straight from the profile
+# ---------------------------------------------------------------------------
+
+_INTENTS = {
+    "rows": r"\bhow many (rows|records|entries|lines)\b|\b(number|count) of (rows|records|entries)\b|\brow count\b",
+    "max": r"\b(max|maximum|highest|largest|biggest)\b",
+    "min": r"\b(min|minimum|lowest|smallest)\b",
+    "mean": r"\b(average|mean|avg)\b",
+    "distinct": r"\b(how many|number of) (distinct|unique)\b",
+    "nulls": r"\b(how many|number of) (missing|null|nan|empty)\b",
+}
+
+# Words that may surround "<aggregate> <column>" without changing its meaning.
+# Any other word (a filter, a group, a unit, a year...) needs real computation.
+_FILLER = {
+    "what", "whats", "s", "is", "are", "was", "the", "a", "an", "of", "in", "me", "tell",
+    "show", "give", "find", "get", "value", "values", "column", "field", "dataset", "data",
+    "file", "table", "there", "please", "does", "do", "have", "has", "overall",
+}
+
+_LABELS = {"max": "maximum", "min": "minimum", "mean": "average"}
+
+
+def _name_pattern(name):
+    """Regex matching a table/column name as written in plain English."""
+    base = os.path.splitext(name)[0] if name.lower().endswith((".csv", ".db")) else name
+    spaced = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", base).replace("_", " ").lower()
+    variants = {base.lower(), spaced, name.lower()}
+    return r"\b(" + "|".join(re.escape(v) for v in sorted(variants, key=len, reverse=True)) + r")\b"
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def _leftover_words(text, intent, names):
+    """
+    Words of the question besides the aggregate, the given names and
+    filler, e.g. ["furnished", "homes"] in "highest price among furnished
+    homes". The profile only answers questions leaving none.
+    """
+    text = re.sub(_INTENTS[intent], " ", text)
+    for name in names:
+        text = re.sub(_name_pattern(name), " ", text)
+    return [word for word in re.findall(r"[a-z0-9]+", text) if word not in _FILLER]
+
+
+def answer_from_profiles(query, file_paths, upload_dir="uploads"):
+    """
+    Answers "how many rows", "max/min/average of <column>", distinct and
+    missing counts from the saved profiles. Returns None whenever the
+    question says anything more (filters, groups, charts, units) or does
+    not point at exactly one table/column.
+    """
+    text = query.lower().strip()
+    intents = [name for name, pattern in _INTENTS.items() if re.search(pattern, text)]
+    if len(intents) != 1:
+        return None
+    intent = intents[0]
+
+    candidates = []  # (source file, table name, table profile)
+    for file_name in file_paths:
+        file_path = os.path.join(upload_dir, file_name)
+        if not os.path.exists(file_path):
+            continue
+        profile = load_profile(file_path)
+        if profile is None:
+            ensure_profile_async(file_path)
+            return None  # Incomplete picture - let the workers handle it
+        for table, table_profile in profile["tables"].items():
+            candidates.append((file_name, table, table_profile))
+
+    # Narrow to tables/files the question names, if any
+    named = [c for c in candidates
+             if re.search(_name_pattern(c[1]), text) or re.search(_name_pattern(c[0]), text)]
+    if named:
+        candidates = named
+
+    if intent == "rows":
+        if len(candidates) != 1:
+            return None
+        file_name, table, table_profile = candidates[0]
+        if _leftover_words(text, intent, [file_name, table]):
+            return None
+        where = file_name if table == file_name else f"the {table} table of {file_name}"
+        return f"{where} has {_format(table_profile['rows'])} rows."
+
+    matches = [(file_name, table, column, stats)
+               for file_name, table, table_profile in candidates
+               for column, stats in table_profile["columns"].items()
+               if re.search(_name_pattern(column), text)]
+    if len(matches) != 1:
+        return None
+    file_name, table, column, stats = matches[0]
+    if _leftover_words(text, intent, [file_name, table, column]):
+        return None
+    where = file_name if table == file_name else f"the {table} table of {file_name}"
+
+    if intent == "distinct":
+        if stats["distinct"] is None:
+            return None
+        return f"{column} in {where} has {_format(stats['distinct'])} distinct values."
+    if intent == "nulls":
+        return f"{column} in {where} has {_format(stats['nulls'])} missing values."
+
+    value = stats[intent]
+    if value is None:
+        return None
+    return f"The {_LABELS[intent]} {column} in {where} is {_format(value)}."
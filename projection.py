@@ -0,0 +1,123 @@
+import ast
+import pandas as pd
+
+# DataFrame methods that keep every column of `df`, so the expression is
+# still safe to project as long as it ends in an explicit column selection.
+# String arguments to these are treated as column references.
+_CHAIN_METHODS = {
+    "groupby", "sort_values", "sort_index", "head", "tail",
+    "nlargest", "nsmallest", "reset_index",
+}
+
+# Names that let code reach `df` without us seeing it
+_DYNAMIC_NAMES = {"eval", "exec", "globals", "locals", "vars", "getattr"}
+
+
+class _Unprovable(Exception):
+    pass
+
+
+def _string_keys(node):
+    """Column names of a `'col'` / `['a', 'b']` subscript, else None."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, (ast.List, ast.Tuple)) and node.elts and all(
+        isinstance(e, ast.Constant) and isinstance(e.value, str) for e in node.elts
+    ):
+        return [e.value for e in node.elts]
+    return None
+
+
+def _call_strings(call):
+    """String constants passed to a call, positionally or by keyword."""
+    values = list(call.args) + [kw.value for kw in call.keywords]
+    names = []
+    for value in values:
+        keys = _string_keys(value)
+        if keys:
+            names.extend(keys)
+    return names
+
+
+def _walk_chain(node, parents, columns, found):
+    """
+    Follows one use of `df` outward until it selects explicit columns.
+    Raises _Unprovable if the expression may depend on any other column.
+    """
+    current = node
+    while True:
+        parent = parents.get(current)
+
+        # df['a'] / df[['a', 'b']] ends the chain; df[mask] keeps every column
+        if isinstance(parent, ast.Subscript) and parent.value is current:
+            keys = _string_keys(parent.slice)
+            if keys is not None:
+                found.update(keys)
+                return
+            current = parent
+            continue
+
+        if not (isinstance(parent, ast.Attribute) and parent.value is current):
+            raise _Unprovable()
+
+        # df.price is a column unless it shadows a DataFrame attribute
+        if parent.attr in columns and not hasattr(pd.DataFrame, parent.attr):
+            found.add(parent.attr)
+            return
+
+        if parent.attr in ("loc", "iloc"):
+            indexer = parents.get(parent)
+            if not (isinstance(indexer, ast.Subscript) and indexer.value is parent):
+                raise _Unprovable()
+            if isinstance(indexer.slice, ast.Tuple):
+                # .loc[rows, 'col'] names its columns; .iloc positions don't
+                keys = _string_keys(indexer.slice.elts[-1]) if parent.attr == "loc" else None
+                if keys is None or len(indexer.slice.elts) != 2:
+                    raise _Unprovable()
+                found.update(keys)
+                return
+            current = indexer
+            continue
+
+        if parent.attr in _CHAIN_METHODS:
+            call = parents.get(parent)
+            if not (isinstance(call, ast.Call) and call.func is parent):
+                raise _Unprovable()
+            found.update(_call_strings(call))
+            current = call
+            continue
+
+        raise _Unprovable()
+
+
+def referenced_columns(code, columns, name="df"):
+    """
+    Statically finds which of `columns` the snippet reads from `df`.
+    Returns them in file order, or None when the analysis can't prove the
+    snippet needs only those (the caller must then load every column).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+
+    found = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Name):
+            continue
+        if node.id in _DYNAMIC_NAMES:
+            return None
+        if node.id != name or not isinstance(node.ctx, ast.Load):
+            continue
+        try:
+            _walk_chain(node, parents, set(columns), found)
+        except _Unprovable:
+            return None
+
+    used = [c for c in columns if c in found]
+    return used or None
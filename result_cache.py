@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from config import settings
+from data_cache import file_fingerprint
+
+# Code or SQL whose output can differ between identical runs is never cached
+# (SQLite: RANDOM(), RANDOMBLOB(), date('now'), CURRENT_TIMESTAMP...)
+_NONDETERMINISTIC = re.compile(
+    r"\b(random|randomblob|sample|shuffle|now|today|time|uuid|current_(date|time|timestamp))\b",
+    re.IGNORECASE,
+)
+
+
+def is_deterministic(*texts):
+    """False if any of the code / SQL texts may give a different result next time."""
+    return not any(_NONDETERMINISTIC.search(text) for text in texts if text)
+
+
+class ResultCache:
+    """
+    On-disk memo of tool outputs (text plus chart image) keyed by the
+    tool, its arguments and the fingerprint of the data file they ran
+    against. Entries expire after `ttl` seconds, the least recently used
+    ones are dropped once the store exceeds `max_bytes`, and entries for
+    older versions of a file are removed as soon as a newer one is stored.
+    """
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, source TEXT, fingerprint TEXT,"
+            " output TEXT, chart_path TEXT, chart BLOB,"
+            " size INTEGER, created REAL, last_used REAL)"
+        )
+        return conn
+
+    @staticmethod
+    def make_key(tool_name, source_path, fingerprint_of=file_fingerprint, **args):
+        """
+        Returns (key, source, fingerprint) for one tool call. Pass
+        `fingerprint_of=db_fingerprint` for SQLite sources, whose WAL can
+        change without touching the main file.
+        """
+        fingerprint = json.dumps(fingerprint_of(source_path))
+        payload = json.dumps({"tool": tool_name, "fingerprint": fingerprint, **args},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest(), os.path.abspath(source_path), fingerprint
+
+    @staticmethod
+    def cacheable(code, sql_query=None):
+        """False if the code (or the SQL it runs on) may give a different result next time."""
+        return is_deterministic(code, sql_query)
+
+    def get(self, key):
+        """Cached output for `key` (restoring its chart file), or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT output, chart_path, chart, created FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                output, chart_path, chart, created = row
+                if time.time() - created > self.ttl:
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            finally:
+                conn.close()
+
+        # The chart file may have been overwritten by a later call since
+        if chart_path and chart is not None:
+            os.makedirs(os.path.dirname(chart_path) or ".", exist_ok=True)
+            with open(chart_path, "wb") as f:
+                f.write(chart)
+        return output
+
+    def put(self, key, source, fingerprint, output, chart_path=None):
+        if not self.enabled:
+            return
+        chart = None
+        if chart_path and os.path.exists(chart_path):
+            with open(chart_path, "rb") as f:
+                chart = f.read()
+        size = len(output.encode()) + (len(chart) if chart else 0)
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                # Results computed on older versions of the file are dead
+                conn.execute("DELETE FROM results WHERE source = ? AND fingerprint != ?",
+                             (source, fingerprint))
+                conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, source, fingerprint, output, chart_path, chart, size, now, now),
+                )
+                # Evict least recently used entries beyond the size cap
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                if total > self.max_bytes:
+                    for old_key, old_size in conn.execute(
+                        "SELECT key, size FROM results ORDER BY last_used"
+                    ).fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                        total -= old_size
+                conn.commit()
+            finally:
+                conn.close()
+
+
+result_cache = ResultCache(
+    settings.RESULT_CACHE_PATH,
+    settings.RESULT_CACHE_MAX_BYTES,
+    settings.RESULT_CACHE_TTL_SECONDS,
+)
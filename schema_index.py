@@ -0,0 +1,138 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from config import settings
+from sqlite_pool import readonly_connection
+
+# Bump when tokenization changes so old indexes get rebuilt
+INDEX_VERSION = 1
+
+# Words that say nothing about which table a question is about
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "and", "or", "with", "what",
+    "which", "who", "how", "many", "much", "is", "are", "was", "were", "show", "me", "list",
+    "give", "find", "get", "all", "each", "per", "top", "most", "least", "from", "that",
+    "this", "their", "its", "do", "does", "did", "have", "has", "there", "as", "at", "be",
+}
+
+# Table names say the most about a table, sample values the least
+_FIELD_WEIGHTS = {"table": 3, "column": 2, "value": 1}
+
+
+def tokenize(text):
+    """Lower-cased words of names and questions ("OrderDetails" -> order, detail)."""
+    text = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", str(text))
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS:
+            continue
+        # Crude plural folding so "customers" finds the Customer table
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def index_path(db_path):
+    """Location of the schema relevance index of a .db file."""
+    directory, name = os.path.split(os.path.abspath(db_path))
+    if os.path.basename(directory) != ".cache":  # SQL copies of CSVs already live there
+        directory = os.path.join(directory, ".cache")
+    return os.path.join(directory, f"{name}.schema_index.json")
+
+
+def _stamp(db_path):
+    stat = os.stat(db_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns,
+            "index_version": INDEX_VERSION}
+
+
+def build_schema_index(db_path):
+    """
+    Computes and saves the term counts of every table of a database: its
+    name, column names and distinct text values from the first rows.
+    """
+    tables = {}
+    with readonly_connection(db_path) as conn:
+        names = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        for name in names:
+            quoted = name.replace('"', '""')
+            columns = [col[1] for col in conn.execute(f'PRAGMA table_info("{quoted}")')]
+            terms = Counter()
+            for token in tokenize(name):
+                terms[token] += _FIELD_WEIGHTS["table"]
+            for column in columns:
+                for token in tokenize(column):
+                    terms[token] += _FIELD_WEIGHTS["column"]
+            try:
+                rows = conn.execute(
+                    f'SELECT * FROM "{quoted}" LIMIT {int(settings.SCHEMA_INDEX_SAMPLE_ROWS)}'
+                ).fetchall()
+            except Exception:
+                rows = []  # e.g. a virtual table whose module is not available
+            values = {v for row in rows for v in row if isinstance(v, str) and len(v) <= 40}
+            for value in values:
+                for token in tokenize(value):
+                    terms[token] += _FIELD_WEIGHTS["value"]
+            tables[name] = dict(terms)
+
+    index = {**_stamp(db_path), "tables": tables}
+    target = index_path(db_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, target)
+    return index
+
+
+def load_schema_index(db_path):
+    """Saved index of this version of `db_path`, built now if missing or stale."""
+    target = index_path(db_path)
+    try:
+        with open(target) as f:
+            index = json.load(f)
+        if all(index.get(k) == v for k, v in _stamp(db_path).items()):
+            return index
+    except (OSError, ValueError):
+        pass
+    return build_schema_index(db_path)
+
+
+def score_tables(index, question, k1=1.5, b=0.75):
+    """
+    {table: BM25 score} for `question`. Tables sharing no term with the
+    question are left out.
+    """
+    documents = index["tables"]
+    if not documents:
+        return {}
+    lengths = {name: sum(terms.values()) for name, terms in documents.items()}
+    average = sum(lengths.values()) / len(lengths) or 1
+    query = set(tokenize(question))
+
+    scores = {}
+    for term in query:
+        containing = sum(1 for terms in documents.values() if term in terms)
+        if not containing:
+            continue
+        idf = math.log(1 + (len(documents) - containing + 0.5) / (containing + 0.5))
+        for name, terms in documents.items():
+            tf = terms.get(term, 0)
+            if tf:
+                norm = tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[name] / average))
+                scores[name] = scores.get(name, 0.0) + idf * norm
+    return scores
+
+
+def rank_tables(index, question):
+    """Tables relevant to `question`, best first."""
+    scores = score_tables(index, question)
+    return sorted(scores, key=lambda name: -scores[name])
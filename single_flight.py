@@ -0,0 +1,35 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts
+    the work, and callers arriving before it finishes wait for that same
+    result (or exception) instead of starting another run. Nothing is
+    kept once the work is done; the next call runs it again.
+    """
+
+    def __init__(self):
+        self._running = {}
+
+    def __len__(self):
+        return len(self._running)
+
+    async def do(self, key, make):
+        """Result of `make()` (a coroutine function), shared per in-flight `key`."""
+        task = self._running.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make())
+            self._running[key] = task
+
+            def finished(done):
+                if self._running.get(key) is done:
+                    del self._running[key]
+            task.add_done_callback(finished)
+        else:
+            print("DEBUG: Joined an identical query already running")
+        # A caller giving up must not cancel the run the others wait for
+        return await asyncio.shield(task)
+
+
+query_flights = SingleFlight()
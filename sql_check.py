@@ -0,0 +1,102 @@
+import re
+import sqlite3
+import difflib
+from catalog import schema_catalog
+from sqlite_pool import readonly_connection
+from sql_results import normalize_sql
+
+_READ_STATEMENT = re.compile(r"^(\( ?)*(select|with|values)\b")
+_ERROR_NAME = re.compile(r"^(no such table|no such column|ambiguous column name): (.+)$")
+# [Name], "Name", `Name` or a bare word
+_IDENTIFIER = re.compile(r'\[([^\]]+)\]|"((?:[^"]|"")+)"|`((?:[^`]|``)+)`|([A-Za-z_][\w$]*)')
+
+
+def table_columns(db_path, include_views=True):
+    """{table: [column, ...]} for every table (and view) of a database."""
+    types = "('table', 'view')" if include_views else "('table')"
+    with readonly_connection(db_path) as conn:
+        names = [r[0] for r in conn.execute(
+            f"SELECT name FROM sqlite_master WHERE type IN {types} AND name NOT LIKE 'sqlite_%'"
+        )]
+        tables = {}
+        for name in names:
+            quoted = name.replace('"', '""')
+            tables[name] = [col[1] for col in conn.execute(f'PRAGMA table_info("{quoted}")')]
+    return tables
+
+
+def _used_tables(query, tables):
+    """Tables of `tables` whose name appears as an identifier in `query`."""
+    words = {next(g for g in m.groups() if g).lower() for m in _IDENTIFIER.finditer(query)}
+    # Attached tables are keyed "alias.table"; the query may name either part
+    return [t for t in tables if t.lower() in words or t.rsplit(".", 1)[-1].lower() in words]
+
+
+def _close_columns(column, tables, cutoff=0.6):
+    candidates = [f"{t}.{c}" for t, columns in tables.items() for c in columns]
+    matches = difflib.get_close_matches(column, [c.rsplit(".", 1)[1] for c in candidates], n=3, cutoff=cutoff)
+    return [c for c in candidates if c.rsplit(".", 1)[1] in matches][:5]
+
+
+def _suggest(kind, name, tables, used=()):
+    """
+    Hint for a bad table/column name, based on the cached schema. Columns
+    of the `used` tables (the ones the query reads) are suggested first.
+    """
+    if kind == "no such table":
+        matches = difflib.get_close_matches(name, list(tables), n=3, cutoff=0.6)
+        if not matches:
+            matches = [t for t in tables if t.lower().replace(" ", "") == name.lower().replace(" ", "")]
+        return f" Did you mean: {', '.join(matches)}? (quote names with spaces as [Name])" if matches else ""
+
+    column = name.split(".")[-1]
+    owners = [t for t, columns in tables.items() if column.lower() in (c.lower() for c in columns)]
+    owners.sort(key=lambda t: t not in used)
+    if kind == "ambiguous column name":
+        return f" {column} exists in {', '.join(owners)}; qualify it with a table alias." if owners else ""
+    if owners:
+        return f" {column} exists in {', '.join(owners)}; check the table alias it is qualified with."
+    if not used:
+        matches = _close_columns(column, tables)
+        return f" Did you mean: {', '.join(matches)}?" if matches else ""
+    matches = _close_columns(column, {t: tables[t] for t in used})
+    if matches:
+        return f" Did you mean: {', '.join(matches)}?"
+    # Only a near-identical name makes another table worth joining
+    others = _close_columns(column, {t: c for t, c in tables.items() if t not in used}, cutoff=0.8)
+    if others:
+        return f" Not a column of {', '.join(used)}; join the table that has it: {', '.join(others)}."
+    listed = "; ".join(f"{t}: {', '.join(tables[t][:20])}" for t in used[:2])
+    return f" Columns of the queried tables - {listed}."
+
+
+def check_query(db_path, query, attach=()):
+    """
+    Validates a query locally in milliseconds: it must be a single
+    read-only statement, and SQLite must be able to prepare it (syntax,
+    tables, columns, ambiguous names) without running it. Returns None if
+    the query is fine, otherwise an error message with suggestions.
+    """
+    body = re.sub(r"[\s;]+$", "", query or "")
+    if not body.strip():
+        return "Error: Empty query."
+    if not _READ_STATEMENT.match(normalize_sql(body)):
+        return "Error: Only read-only SELECT queries are allowed."
+
+    with readonly_connection(db_path, attach) as conn:
+        try:
+            # EXPLAIN compiles the statement without executing it
+            conn.execute(f"EXPLAIN {body}")
+            return None
+        except (sqlite3.Error, sqlite3.Warning) as e:
+            message = str(e).rstrip(".")
+
+    match = _ERROR_NAME.match(message)
+    hint = ""
+    if match:
+        tables = dict(schema_catalog.get(db_path, table_columns))
+        for alias, path in attach:
+            for table, columns in schema_catalog.get(path, table_columns).items():
+                tables[f"{alias}.{table}"] = columns
+        hint = _suggest(match.group(1), match.group(2), tables, _used_tables(body, tables))
+    return f"Error: {message}.{hint}"
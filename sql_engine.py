@@ -0,0 +1,52 @@
+import threading
+from functools import partial
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from langchain_community.utilities import SQLDatabase
+from config import settings
+from sqlite_pool import connection_key, same_files, open_readonly
+
+
+class SQLToolRegistry:
+    """
+    Keeps one SQLDatabase (engine + reflected schema) and its toolkit tools
+    per database version (and set of attached databases), so SQL loop
+    iterations stop rebuilding them. A new version of a file replaces the
+    old entry and disposes its engine.
+    """
+
+    def __init__(self):
+        self._entries = {}  # connection_key -> (SQLDatabase, tools)
+        self._lock = threading.Lock()
+
+    def get(self, db_path, build_tools, attach=()):
+        attach = tuple(attach)
+        fingerprint = connection_key(db_path, attach)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+        if entry is not None:
+            return entry
+
+        # Same tuned read-only connections as the raw pool, pooled by SQLAlchemy
+        engine = create_engine(
+            "sqlite://",
+            creator=partial(open_readonly, db_path, attach),
+            poolclass=QueuePool,
+            pool_size=settings.SQLITE_POOL_SIZE,
+            max_overflow=settings.SQLITE_POOL_SIZE,
+        )
+        db = SQLDatabase(engine, include_tables=None)
+        entry = (db, build_tools(db, db_path, attach))
+
+        with self._lock:
+            if fingerprint in self._entries:
+                # Built concurrently by another request - keep theirs
+                db._engine.dispose()
+                return self._entries[fingerprint]
+            for old in [k for k in self._entries if same_files(k, fingerprint)]:
+                self._entries.pop(old)[0]._engine.dispose()
+            self._entries[fingerprint] = entry
+        return entry
+
+
+sql_registry = SQLToolRegistry()
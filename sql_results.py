@@ -0,0 +1,318 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+from config import settings
+from sqlite_pool import connection_key, readonly_connection
+from result_cache import is_deterministic
+from executor import budget_hit
+
+try:
+    import pyarrow as pa
+except ImportError:  # Without pyarrow every caller simply re-runs its query
+    pa = None
+
+# Same per-value limit the SQL toolkit applies to its text results
+_MAX_STRING_LENGTH = 100
+
+# Tool output starting with this means a query was stopped by a guardrail
+QUERY_TOO_EXPENSIVE = "Error: Query too expensive"
+
+_LIMIT_TEXT = {"time": "time limit of {}s", "rows": "row limit of {}", "bytes": "size limit of {} bytes"}
+
+# Quoted literals/identifiers (kept verbatim), comments, whitespace, anything else
+_SQL_TOKENS = re.compile(
+    r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|\[[^\]]*\]|`(?:[^`]|``)*`)"""
+    r"|(--[^\n]*|/\*.*?(?:\*/|$))"
+    r"|(\s+)"
+    r"""|([^'"\[`\s/-]+|.)""",
+    re.S,
+)
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def normalize_sql(query):
+    """
+    Canonical text of a query for cache keys: comments dropped, whitespace
+    collapsed, trailing semicolons removed and everything outside quotes
+    lower-cased (SQLite keywords and identifiers ignore ASCII case).
+    """
+    parts = []
+    for quoted, comment, space, other in _SQL_TOKENS.findall(query):
+        if quoted:
+            parts.append(quoted)
+        elif comment or space:
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        else:
+            parts.append(other.translate(_ASCII_LOWER))
+    return re.sub(r"[\s;]+$", "", "".join(parts))
+
+
+class QueryTooExpensive(Exception):
+    """A query ran past its time budget or fetched too many rows/bytes."""
+
+    def __init__(self, kind, limit):
+        self.kind = kind
+        self.limit = limit
+        super().__init__(
+            f"{QUERY_TOO_EXPENSIVE} ({_LIMIT_TEXT[kind].format(limit)}). The query was stopped. "
+            "Rewrite it to be cheaper: join only on matching keys, filter with WHERE, "
+            "aggregate with GROUP BY and add a LIMIT instead of fetching raw rows."
+        )
+
+
+class SQLResultStore:
+    """
+    Arrow copies of SQL query results, keyed by the normalized query text
+    and the version of the database it ran against. Files live next to the
+    database (`.cache/sql_results/`), so the executor processes share them
+    with the server: a chart over the rows the SQL tool just fetched reads
+    them back instead of running the query again. The least recently used
+    files are deleted once the store exceeds `max_bytes`.
+
+    Results put with `persist=False` (the SQL tool's, most of which never
+    become a chart) are only held in memory, within a quarter of
+    `max_bytes`; they are written to disk the first time describe() asks
+    for them, i.e. when the chart step needs them.
+    """
+
+    _MAX_PENDING = 16
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()  # path -> (DataFrame, query text, nbytes)
+
+    @property
+    def enabled(self):
+        return pa is not None and self.max_bytes > 0
+
+    @staticmethod
+    def _directory(db_path):
+        return os.path.join(os.path.dirname(os.path.abspath(db_path)), ".cache", "sql_results")
+
+    def path_for(self, db_path, query, attach=()):
+        payload = repr((connection_key(db_path, attach), normalize_sql(query)))
+        name = hashlib.sha256(payload.encode()).hexdigest()
+        return os.path.join(self._directory(db_path), f"{name}.arrow")
+
+    def get(self, db_path, query, attach=()):
+        """
+        (DataFrame, query text it was stored under) for the stored result
+        of `query` on this version of the database, or None.
+        """
+        if not self.enabled:
+            return None
+        path = self.path_for(db_path, query, attach)
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is not None:
+                self._pending.move_to_end(path)
+                return pending[0].copy(), pending[1]
+        try:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(path)  # mtime doubles as last-used time for eviction
+        except (OSError, pa.ArrowInvalid):
+            return None
+        stored_query = (table.schema.metadata or {}).get(b"query", b"").decode()
+        return table.to_pandas(), stored_query
+
+    def describe(self, db_path, query, attach=()):
+        """(columns with Arrow types, row count) of a stored result, or None."""
+        if not self.enabled:
+            return None
+        path = self.path_for(db_path, query, attach)
+        self._persist(path)
+        try:
+            with pa.memory_map(path) as source:
+                reader = pa.ipc.open_file(source)
+                rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+                return [(field.name, str(field.type)) for field in reader.schema], rows
+        except (OSError, pa.ArrowInvalid):
+            return None
+
+    def put(self, db_path, query, df, attach=(), persist=True):
+        if not self.enabled:
+            return
+        path = self.path_for(db_path, query, attach)
+        if persist:
+            self._write(path, df, query.strip())
+            return
+
+        nbytes = int(df.memory_usage(deep=True).sum())
+        budget = self.max_bytes // 4
+        if nbytes > budget:
+            return
+        with self._lock:
+            self._pending.pop(path, None)
+            self._pending[path] = (df, query.strip(), nbytes)
+            total = sum(entry[2] for entry in self._pending.values())
+            while total > budget or len(self._pending) > self._MAX_PENDING:
+                _, (_, _, evicted) = self._pending.popitem(last=False)
+                total -= evicted
+
+    def _persist(self, path):
+        """Writes a result held in memory to disk, if there is one for `path`."""
+        with self._lock:
+            pending = self._pending.pop(path, None)
+        if pending is not None:
+            self._write(path, pending[0], pending[1])
+
+    def _write(self, path, df, query):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return  # Mixed-type columns (SQLite allows them) are not worth storing
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), b"query": query.encode()}
+        )
+        if table.nbytes > self.max_bytes:
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARNING: Could not store SQL result: {e}")
+            return
+        self._evict(os.path.dirname(path))
+
+    def _evict(self, directory):
+        with self._lock:
+            entries = []
+            for name in os.listdir(directory):
+                if not name.endswith(".arrow"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+                total -= size
+
+
+sql_result_store = SQLResultStore(settings.SQL_RESULT_STORE_MAX_BYTES)
+
+
+def _column_names(conn, query):
+    """Result column names of `query`, without running it (None if unknown)."""
+    try:
+        body = re.sub(r"[\s;]+$", "", query)
+        cursor = conn.execute(f"SELECT * FROM (\n{body}\n) LIMIT 0")
+    except sqlite3.Error:
+        return None
+    return [d[0] for d in cursor.description]
+
+
+def run_query(db_path, query, attach=(), persist=True):
+    """
+    Returns the result of `query` as a DataFrame, read from the result
+    store when this version of the database already answered it (or an
+    equivalent query differing only in case, spacing or comments).
+    `attach` lists (alias, path) of databases attached for the query.
+    With `persist=False` a new result is only kept in memory until
+    the store is asked to describe it. Queries whose answer can change
+    between runs (RANDOM(), date('now')...) always run and are never stored.
+    """
+    reusable = is_deterministic(query)
+    stored = sql_result_store.get(db_path, query, attach) if reusable else None
+    with readonly_connection(db_path, attach) as conn:
+        if stored is not None:
+            df, stored_query = stored
+            if stored_query == query.strip():
+                print("DEBUG: SQL result cache hit")
+                return df
+            # SQLite names unaliased columns after their source text, which
+            # may be spelled differently in this query
+            columns = _column_names(conn, query)
+            if columns is not None and len(columns) == len(df.columns):
+                print("DEBUG: SQL result cache hit (equivalent query)")
+                df.columns = columns
+                return df
+
+        columns, rows = _fetch_guarded(conn, query)
+    if columns is None:
+        return pd.DataFrame()
+    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    if reusable:
+        sql_result_store.put(db_path, query, df, attach, persist)
+    return df
+
+
+def _row_bytes(row):
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+
+
+def _fetch_guarded(conn, query):
+    """
+    Runs `query` within the configured time budget (enforced by SQLite's
+    progress handler) and row/byte caps. Returns (columns, rows); columns
+    is None for statements without a result. Raises QueryTooExpensive.
+    """
+    timeout = settings.SQL_QUERY_TIMEOUT_SECONDS
+    max_rows = settings.SQL_MAX_ROWS
+    max_bytes = settings.SQL_MAX_BYTES
+    deadline = time.monotonic() + timeout
+
+    def stop():
+        # Also stops for the executor's job limits: their signal can't raise
+        # through this callback, only make it return true
+        return bool(budget_hit()) or bool(timeout and time.monotonic() > deadline)
+
+    # Called every N virtual machine steps; a true result aborts the query
+    conn.set_progress_handler(stop, 10000)
+    try:
+        cursor = conn.execute(query)
+        if cursor.description is None:
+            return None, []
+        rows = []
+        size = 0
+        while True:
+            batch = cursor.fetchmany(1000)
+            if not batch:
+                break
+            rows.extend(batch)
+            if max_rows and len(rows) > max_rows:
+                raise QueryTooExpensive("rows", max_rows)
+            size += sum(_row_bytes(row) for row in batch)
+            if max_bytes and size > max_bytes:
+                raise QueryTooExpensive("bytes", max_bytes)
+        return [d[0] for d in cursor.description], rows
+    except sqlite3.OperationalError as e:
+        if timeout and "interrupted" in str(e) and time.monotonic() > deadline:
+            raise QueryTooExpensive("time", timeout) from None
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def _truncate(value):
+    if not isinstance(value, str) or len(value) <= _MAX_STRING_LENGTH:
+        return value
+    return value[: _MAX_STRING_LENGTH - 3].rsplit(" ", 1)[0] + "..."
+
+
+def format_rows(df):
+    """Renders a result the way the SQL toolkit does: a list of row tuples."""
+    if df.empty:
+        return ""
+    values = df.astype(object).where(df.notna(), None)
+    return str([tuple(_truncate(v) for v in row) for row in values.itertuples(index=False, name=None)])
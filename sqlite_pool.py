@@ -0,0 +1,119 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from config import settings
+
+
+def db_fingerprint(db_path):
+    """
+    Identifies one version of a SQLite database: (absolute path, size,
+    mtime), plus the same for its write-ahead log, which can change
+    without touching the main file.
+    """
+    abs_path = os.path.abspath(db_path)
+    stat = os.stat(abs_path)
+    fingerprint = (abs_path, stat.st_size, stat.st_mtime_ns)
+    wal_path = f"{abs_path}-wal"
+    if os.path.exists(wal_path):
+        wal = os.stat(wal_path)
+        fingerprint += (wal.st_size, wal.st_mtime_ns)
+    return fingerprint
+
+
+def _readonly_uri(db_path):
+    uri = f"file:{os.path.abspath(db_path)}?mode=ro"
+    if settings.SQLITE_IMMUTABLE:
+        uri += "&immutable=1"
+    return uri
+
+
+def open_readonly(db_path, attach=()):
+    """
+    Opens a read-only SQLite connection (mode=ro, optionally immutable=1)
+    tuned with the configured mmap_size, cache_size and temp_store pragmas.
+    `attach` lists (alias, path) of further databases attached to it, so
+    one query can join tables of several files as alias.Table.
+    """
+    conn = sqlite3.connect(_readonly_uri(db_path), uri=True, check_same_thread=False)
+    schemas = ["main"]
+    for alias, path in attach:
+        conn.execute(f'ATTACH DATABASE ? AS "{alias}"', (_readonly_uri(path),))
+        schemas.append(alias)
+    for schema in schemas:
+        conn.execute(f'PRAGMA "{schema}".mmap_size = {int(settings.SQLITE_MMAP_SIZE)}')
+        conn.execute(f'PRAGMA "{schema}".cache_size = {-int(settings.SQLITE_CACHE_SIZE_KB)}')
+    conn.execute(f"PRAGMA temp_store = {settings.SQLITE_TEMP_STORE}")
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+class ReadOnlyPool:
+    """Keeps up to `size` idle read-only connections to one database version."""
+
+    def __init__(self, db_path, size, attach=()):
+        self.db_path = db_path
+        self.attach = attach
+        self.size = size
+        self._idle = queue.LifoQueue()  # most recently used = warmest page cache
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = open_readonly(self.db_path, self.attach)
+        try:
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+                if self._idle.qsize() < self.size:
+                    self._idle.put(conn)
+                    conn = None
+            except sqlite3.Error:
+                pass
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}  # connection_key -> ReadOnlyPool
+_pools_lock = threading.Lock()
+
+
+def connection_key(db_path, attach=()):
+    """Identifies one version of a database together with its attached ones."""
+    return (db_fingerprint(db_path), tuple((alias, db_fingerprint(path)) for alias, path in attach))
+
+
+def same_files(key, other):
+    """True if two connection keys cover the same files (maybe other versions)."""
+    return (key[0][0] == other[0][0]
+            and [(a, f[0]) for a, f in key[1]] == [(a, f[0]) for a, f in other[1]])
+
+
+@contextmanager
+def readonly_connection(db_path, attach=()):
+    """
+    Checks out a pooled read-only connection to the current version of
+    `db_path` (with `attach` databases attached); pools of older versions
+    are closed.
+    """
+    attach = tuple(attach)
+    key = connection_key(db_path, attach)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            for old in [k for k in _pools if same_files(k, key)]:
+                _pools.pop(old).close()
+            pool = _pools[key] = ReadOnlyPool(db_path, settings.SQLITE_POOL_SIZE, attach)
+    with pool.connection() as conn:
+        yield conn
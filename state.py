@@ -8,4 +8,5 @@ class AgentState(TypedDict):
     file_paths: List[str]  # List of uploaded files
     active_worker: str     # 'sql', 'csv', 'db_chart_worker', or 'general'
     last_sql_query: Optional[str]  # Stores SQL query for chart generation
+    db_files: Optional[List[str]]  # Databases picked for the question (first is main, rest attached)
     chart_code_generated: Optional[bool]  # Flag to track if chart code was generated
\ No newline at end of file
@@ -0,0 +1,79 @@
+import re
+import json
+import time
+
+_CHART_PATH = re.compile(r"Chart saved to:?\s*(.+?\.png)", re.I)
+
+# Tool calls whose arguments are worth showing while the graph runs
+_CODE_TOOLS = {"python_analyst", "db_python_analyst"}
+
+
+def sse(event, data):
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _text(content):
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content if isinstance(content, str) else str(content or "")
+
+
+async def graph_events(graph, initial_state, config):
+    """
+    Runs the graph and yields (event, data) pairs as it goes:
+
+    - route: the supervisor's decision (worker, databases)
+    - sql / code: a query or Python code the model decided to run
+    - tool_start / tool_end: tool calls, with their duration in seconds
+    - token: text written by the model, as it is generated
+    - chart: a chart file is ready
+    - done: the final answer (same fields as /query)
+    """
+    started = {}
+    async for event in graph.astream_events(initial_state, config=config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+        data = event.get("data", {})
+
+        if kind == "on_chain_end" and not event.get("parent_ids"):
+            messages = (data.get("output") or {}).get("messages") or []
+            yield "done", {"answer": _text(messages[-1].content) if messages else ""}
+
+        elif kind == "on_chain_end" and event["name"] == "supervisor" and node == "supervisor":
+            output = data.get("output") or {}
+            yield "route", {
+                "worker": output.get("active_worker"),
+                "db_files": output.get("db_files"),
+                "answered_from_profile": bool(output.get("messages")),
+            }
+
+        elif kind == "on_chat_model_stream":
+            token = _text(getattr(data.get("chunk"), "content", ""))
+            if token:
+                yield "token", {"node": node, "text": token}
+
+        elif kind == "on_chat_model_end":
+            for call in getattr(data.get("output"), "tool_calls", None) or []:
+                args = call.get("args") or {}
+                if call["name"] == "sql_db_query":
+                    yield "sql", {"node": node, "query": args.get("query")}
+                elif call["name"] in _CODE_TOOLS:
+                    yield "code", {"node": node, "tool": call["name"], "code": args.get("code"),
+                                   "file": args.get("file_name") or args.get("db_file")}
+
+        elif kind == "on_tool_start":
+            started[event["run_id"]] = time.perf_counter()
+            yield "tool_start", {"tool": event["name"]}
+
+        elif kind == "on_tool_end":
+            seconds = time.perf_counter() - started.pop(event["run_id"], time.perf_counter())
+            output = _text(getattr(data.get("output"), "content", data.get("output")))
+            yield "tool_end", {
+                "tool": event["name"],
+                "seconds": round(seconds, 3),
+                "error": output.startswith(("Error", "Python Error")),
+            }
+            match = _CHART_PATH.search(output)
+            if match:
+                yield "chart", {"path": match.group(1).strip()}
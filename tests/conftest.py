@@ -0,0 +1,31 @@
+import os
+import sys
+import shutil
+import pytest
+
+# Modules live at the repository root and config.py builds the LLM client
+# on import, which needs an API key even though tests never call it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CEREBRAS_API_KEY", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+UPLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uploads")
+
+
+def _copy_upload(name, directory):
+    path = directory / name
+    shutil.copy(os.path.join(UPLOADS, name), path)
+    return str(path)
+
+
+@pytest.fixture
+def northwind(tmp_path):
+    """Private copy of uploads/northwind.db; caches built next to it stay in tmp_path."""
+    return _copy_upload("northwind.db", tmp_path)
+
+
+@pytest.fixture
+def housing(tmp_path):
+    """Private copy of uploads/Housing.csv, in the same directory as `northwind`."""
+    return _copy_upload("Housing.csv", tmp_path)
@@ -0,0 +1,93 @@
+import json
+import asyncio
+import pytest
+import batch
+from batch import read_items, run_batch
+
+
+@pytest.fixture(autouse=True)
+def routing(monkeypatch):
+    """Prompts mentioning 'orders' go to shop.db, everything else nowhere."""
+    monkeypatch.setattr(batch, "route_databases",
+                        lambda prompt, files: ["shop.db"] if "orders" in prompt.lower() else [])
+
+
+def _collect(items, run, concurrency=4):
+    async def main():
+        return [result async for result in run_batch(items, ["shop.db"], run, concurrency)]
+    return asyncio.run(main())
+
+
+def test_duplicates_ignore_case_and_spacing_and_run_once():
+    calls = []
+
+    async def run(prompt, files):
+        calls.append(prompt)
+        return {"answer": f"answer to {prompt}"}
+
+    results = _collect([("1", "How many orders?"), ("2", "  how   MANY orders? "),
+                        ("3", "Average price?")], run)
+    by_id = {r["id"]: r for r in results}
+
+    assert sorted(calls) == ["Average price?", "How many orders?"]
+    assert by_id["1"]["duplicate_of"] is None
+    assert by_id["2"]["duplicate_of"] == "1"
+    assert by_id["2"]["answer"] == by_id["1"]["answer"] == "answer to How many orders?"
+    assert by_id["2"]["prompt"] == "  how   MANY orders? "
+    assert by_id["1"]["target"] == "shop.db"
+    assert by_id["3"]["target"] == ""
+
+
+def test_concurrency_never_exceeds_the_limit():
+    running = 0
+    peak = 0
+
+    async def run(prompt, files):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"answer": prompt}
+
+    results = _collect([(str(i), f"question {i}") for i in range(12)], run, concurrency=3)
+    assert len(results) == 12
+    assert peak == 3
+
+
+def test_a_failing_prompt_reports_an_error_and_the_batch_goes_on():
+    async def run(prompt, files):
+        if "bad" in prompt:
+            raise RuntimeError("model unavailable")
+        return {"answer": "ok"}
+
+    results = _collect([("1", "bad question"), ("2", "good question"), ("3", "bad question")], run)
+    by_id = {r["id"]: r for r in results}
+
+    assert by_id["1"]["error"] == "model unavailable"
+    assert "answer" not in by_id["1"]
+    assert by_id["3"]["error"] == "model unavailable"
+    assert by_id["3"]["duplicate_of"] == "1"
+    assert by_id["2"]["answer"] == "ok"
+    assert all("seconds" in r and "started" in r for r in results)
+
+
+def test_read_items_accepts_backlog_and_prompt_lines():
+    lines = [
+        json.dumps({"request_id": "user-001", "title": "Short", "body": "Full question"}),
+        "",
+        json.dumps({"id": 7, "prompt": "Explicit prompt"}),
+        json.dumps("Bare string"),
+        json.dumps({"title": "Only a title"}),
+    ]
+    assert read_items(lines) == [
+        ("user-001", "Full question"),
+        ("7", "Explicit prompt"),
+        ("4", "Bare string"),
+        ("5", "Only a title"),
+    ]
+
+
+def test_read_items_rejects_lines_without_a_prompt():
+    with pytest.raises(ValueError, match="Line 2"):
+        read_items([json.dumps("fine"), json.dumps({"id": "x"})])
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+from config import settings
+from chunked import ChunkedFrame
+
+ROWS = 103
+
+
+@pytest.fixture
+def frames(tmp_path, monkeypatch):
+    """(ChunkedFrame streamed in chunks of 10 rows, same CSV read whole)."""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        "city": rng.choice(["Cairo", "Giza", "Alexandria"], ROWS),
+        "rooms": rng.integers(1, 6, ROWS),
+        "price": rng.uniform(1e5, 1e6, ROWS).round(2),
+        # Large values, small spread: the naive variance formula cancels here
+        "ts": 1.7e9 + rng.normal(0, 1, ROWS),
+    })
+    data.loc[::9, "price"] = np.nan
+    path = tmp_path / "homes.csv"
+    data.to_csv(path, index=False)
+    monkeypatch.setattr(settings, "CSV_CHUNK_ROWS", 10)
+    return ChunkedFrame.from_csv(str(path)), pd.read_csv(path)
+
+
+def test_shape_columns_and_head(frames):
+    cf, df = frames
+    assert len(cf) == len(df)
+    assert cf.shape == df.shape
+    assert list(cf.columns) == list(df.columns)
+    pd.testing.assert_frame_equal(cf.head(15).reset_index(drop=True), df.head(15))
+    pd.testing.assert_series_equal(cf.count(), df.count())
+
+
+@pytest.mark.parametrize("column", ["rooms", "price", "ts"])
+@pytest.mark.parametrize("how", ["sum", "count", "mean", "min", "max", "std", "var"])
+def test_column_reductions_match_pandas(frames, column, how):
+    cf, df = frames
+    assert getattr(cf[column], how)() == pytest.approx(getattr(df[column], how)(), rel=1e-6)
+
+
+def test_std_keeps_precision_on_large_values(frames):
+    cf, df = frames
+    assert cf.ts.std() == pytest.approx(df.ts.std(), rel=1e-6)
+    assert cf.ts.var(ddof=0) == pytest.approx(df.ts.var(ddof=0), rel=1e-6)
+
+
+def test_distinct_values_match_pandas(frames):
+    cf, df = frames
+    assert sorted(cf.city.unique()) == sorted(df.city.unique())
+    assert cf.rooms.nunique() == df.rooms.nunique()
+    pd.testing.assert_series_equal(cf.city.value_counts().sort_index(),
+                                   df.city.value_counts().sort_index())
+    pd.testing.assert_series_equal(cf.city.value_counts(normalize=True).sort_index(),
+                                   df.city.value_counts(normalize=True).sort_index())
+
+
+def test_filters_and_arithmetic_match_pandas(frames):
+    cf, df = frames
+    streamed = cf[(cf.rooms > 2) & (cf["city"] != "Giza")]
+    expected = df[(df.rooms > 2) & (df["city"] != "Giza")]
+    assert len(streamed) == len(expected)
+    assert streamed.price.mean() == pytest.approx(expected.price.mean())
+    assert (cf.price / cf.rooms).max() == pytest.approx((df.price / df.rooms).max())
+    assert cf[cf.city.isin(["Cairo"])].rooms.sum() == df[df.city.isin(["Cairo"])].rooms.sum()
+    assert cf[cf.price.isna()].rooms.count() == df[df.price.isna()].rooms.count()
+    assert len(cf[cf.rooms.between(2, 3)]) == len(df[df.rooms.between(2, 3)])
+
+
+def test_column_selection_and_to_pandas(frames):
+    cf, df = frames
+    streamed = cf[cf.rooms == 1][["city", "price"]].to_pandas()
+    pd.testing.assert_frame_equal(streamed, df[df.rooms == 1][["city", "price"]])
+
+
+@pytest.mark.parametrize("how", ["sum", "count", "mean", "min", "max"])
+def test_groupby_matches_pandas(frames, how):
+    cf, df = frames
+    pd.testing.assert_series_equal(getattr(cf.groupby("city")["price"], how)(),
+                                   getattr(df.groupby("city")["price"], how)(),
+                                   check_dtype=False)
+    pd.testing.assert_frame_equal(getattr(cf.groupby(["city", "rooms"])[["price", "ts"]], how)(),
+                                  getattr(df.groupby(["city", "rooms"])[["price", "ts"]], how)(),
+                                  check_dtype=False)
+
+
+def test_groupby_size_matches_pandas(frames):
+    cf, df = frames
+    pd.testing.assert_series_equal(cf.groupby("city").size(), df.groupby("city").size(),
+                                   check_dtype=False)
+
+
+def test_groupby_agg_layout_matches_pandas(frames):
+    cf, df = frames
+    pd.testing.assert_frame_equal(cf.groupby("city")["price"].agg(["sum", "mean"]),
+                                  df.groupby("city")["price"].agg(["sum", "mean"]),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(cf.groupby("city")[["price", "rooms"]].agg(["min", "max"]),
+                                  df.groupby("city")[["price", "rooms"]].agg(["min", "max"]),
+                                  check_dtype=False)
+
+
+def test_unsupported_operations_raise(frames):
+    cf, _ = frames
+    with pytest.raises(AttributeError):
+        cf.pivot_table
+    with pytest.raises(ValueError):
+        cf.groupby("city")["price"].agg(["median"])
+    with pytest.raises(ValueError):
+        bool(cf.rooms > 1)
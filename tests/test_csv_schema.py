@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from executor import _load_dataframe
+from profiler import build_profile
+
+CSV = "\n".join(
+    ["price,furnishingstatus,mainroad"]
+    + [f"{100 + i},{['furnished', 'semi-furnished', 'unfurnished'][i % 3]},{['yes', 'no'][i % 2]}"
+       for i in range(60)]
+)
+
+
+def _write(tmp_path):
+    path = tmp_path / "homes.csv"
+    path.write_text(CSV + "\n")
+    return str(path)
+
+
+def test_generated_code_sees_text_columns_as_strings(tmp_path):
+    df = _load_dataframe({"loader": "csv", "file_path": _write(tmp_path)})
+    assert df["furnishingstatus"].dtype == object
+    counts = df[df.furnishingstatus != "furnished"].furnishingstatus.value_counts()
+    assert "furnished" not in counts.index
+
+
+def test_yes_no_columns_keep_their_values(tmp_path):
+    df = _load_dataframe({"loader": "csv", "file_path": _write(tmp_path)})
+    assert set(df["mainroad"]) == {"yes", "no"}
+    assert (df.mainroad == "yes").sum() == 30
+
+
+def test_groupby_matches_a_plain_read(tmp_path):
+    path = _write(tmp_path)
+    df = _load_dataframe({"loader": "csv", "file_path": path})
+    expected = pd.read_csv(path).groupby("furnishingstatus")["price"].mean()
+    pd.testing.assert_series_equal(df.groupby("furnishingstatus")["price"].mean(), expected,
+                                   check_dtype=False)
+
+
+def test_large_floats_add_up_like_a_plain_read(tmp_path):
+    rng = np.random.default_rng(0)
+    # Whole numbers below 2**24: float32 stores each one exactly
+    revenue = rng.uniform(1e6, 1e7, 200_000).round()
+    revenue[::37] = np.nan
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({"region": np.arange(200_000) % 4, "revenue": revenue}).to_csv(path, index=False)
+
+    df = _load_dataframe({"loader": "csv", "file_path": str(path)})
+    expected = pd.read_csv(path)
+    assert df["revenue"].dtype == np.float64
+    assert df.revenue.sum() == expected.revenue.sum()
+    assert df.revenue.cumsum().iloc[-1] == expected.revenue.cumsum().iloc[-1]
+    pd.testing.assert_series_equal(df.groupby("region")["revenue"].sum(),
+                                   expected.groupby("region")["revenue"].sum(), check_index_type=False)
+
+    profile = build_profile(str(path))
+    mean = profile["tables"]["sales.csv"]["columns"]["revenue"]["mean"]
+    assert mean == pytest.approx(expected.revenue.mean(), rel=1e-12)
+
+
+def test_prompt_metadata_lists_the_dtypes_code_gets(tmp_path):
+    from nodes import get_csv_metadata
+    path = _write(tmp_path)
+    _load_dataframe({"loader": "csv", "file_path": path})  # saves the schema sidecar
+    metadata = get_csv_metadata(path)
+    assert "category" not in metadata
+    assert "furnishingstatus (object)" in metadata
@@ -0,0 +1,105 @@
+import os
+import pandas as pd
+import pytest
+import data_cache
+from data_cache import DataFrameCache, file_fingerprint, load_csv
+
+
+def _frame(rows):
+    return pd.DataFrame({"x": range(rows)})
+
+
+def _nbytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def test_least_recently_used_entries_are_evicted_at_max_bytes():
+    one = _nbytes(_frame(100))
+    cache = DataFrameCache(max_bytes=one * 2)
+    cache.put(("a", 1, 1, None), _frame(100))
+    cache.put(("b", 1, 1, None), _frame(100))
+    assert cache.get(("a", 1, 1, None)) is not None  # now b is the oldest
+    cache.put(("c", 1, 1, None), _frame(100))
+
+    assert cache.get(("b", 1, 1, None)) is None
+    assert cache.get(("a", 1, 1, None)) is not None
+    assert cache.get(("c", 1, 1, None)) is not None
+    assert cache.nbytes == one * 2
+
+
+def test_frames_bigger_than_the_budget_are_not_cached():
+    cache = DataFrameCache(max_bytes=_nbytes(_frame(10)))
+    cache.put(("small", 1, 1, None), _frame(10))
+    cache.put(("big", 1, 1, None), _frame(1000))
+    assert cache.get(("big", 1, 1, None)) is None
+    assert cache.get(("small", 1, 1, None)) is not None
+
+
+def test_invalidate_stale_keeps_only_the_current_version():
+    cache = DataFrameCache(max_bytes=10 ** 9)
+    cache.put(("/f.csv", 10, 1, None), _frame(5))
+    cache.put(("/f.csv", 10, 1, ("x",)), _frame(5))
+    cache.put(("/f.csv", 12, 2, None), _frame(5))
+    cache.put(("/g.csv", 10, 1, None), _frame(5))
+
+    cache.invalidate_stale(("/f.csv", 12, 2))
+    assert cache.get(("/f.csv", 10, 1, None)) is None
+    assert cache.get(("/f.csv", 10, 1, ("x",))) is None
+    assert cache.get(("/f.csv", 12, 2, None)) is not None
+    assert cache.get(("/g.csv", 10, 1, None)) is not None
+    assert cache.nbytes == 2 * _nbytes(_frame(5))
+
+
+def test_invalidate_drops_every_version_of_a_file(tmp_path):
+    path = str(tmp_path / "f.csv")
+    cache = DataFrameCache(max_bytes=10 ** 9)
+    cache.put((path, 10, 1, None), _frame(5))
+    cache.put((path, 12, 2, ("x",)), _frame(5))
+    cache.put(("/g.csv", 10, 1, None), _frame(5))
+
+    cache.invalidate(path)
+    assert cache.get((path, 10, 1, None)) is None
+    assert cache.get((path, 12, 2, ("x",))) is None
+    assert cache.get(("/g.csv", 10, 1, None)) is not None
+    assert cache.nbytes == _nbytes(_frame(5))
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_cache, "df_cache", DataFrameCache(10 ** 9))
+    path = tmp_path / "homes.csv"
+    path.write_text("price,area\n100,50\n200,75\n300,90\n")
+    return str(path)
+
+
+def test_mutating_a_loaded_frame_leaves_the_cache_alone(csv_path):
+    df = load_csv(csv_path)
+    df.loc[0, "price"] = -1
+    df["extra"] = 1
+    df.drop(columns="area", inplace=True)
+
+    again = load_csv(csv_path)
+    assert list(again.columns) == ["price", "area"]
+    assert list(again["price"]) == [100, 200, 300]
+    cached = data_cache.df_cache.get(file_fingerprint(csv_path) + (None,))
+    assert list(cached["price"]) == [100, 200, 300]
+
+
+def test_mutating_a_projected_frame_leaves_the_cache_alone(csv_path):
+    load_csv(csv_path)
+    prices = load_csv(csv_path, columns=["price"])
+    assert list(prices.columns) == ["price"]
+    prices["price"] *= 10
+    assert list(load_csv(csv_path)["price"]) == [100, 200, 300]
+    assert list(load_csv(csv_path, columns=["price"])["price"]) == [100, 200, 300]
+
+
+def test_a_changed_file_is_read_again(csv_path):
+    assert len(load_csv(csv_path)) == 3
+    with open(csv_path, "a") as f:
+        f.write("400,120\n")
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert list(load_csv(csv_path)["price"]) == [100, 200, 300, 400]
+    # The old version's frame is gone
+    assert len(data_cache.df_cache._entries) == 1
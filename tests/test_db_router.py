@@ -0,0 +1,47 @@
+import os
+import pytest
+from db_router import route_databases, attach_list, database_alias
+
+FILES = ["northwind.db", "Housing.csv"]
+
+
+@pytest.fixture
+def upload_dir(northwind, housing):
+    return os.path.dirname(northwind)
+
+
+def test_single_file_is_returned_as_is(upload_dir):
+    assert route_databases("anything", ["Housing.csv"], upload_dir) == ["Housing.csv"]
+
+
+@pytest.mark.parametrize("files", [FILES, FILES[::-1]])
+def test_main_database_is_the_one_the_question_is_about(upload_dir, files):
+    assert route_databases("top 5 products by unit price", files, upload_dir) == ["northwind.db"]
+    assert route_databases("average price by furnishingstatus", files, upload_dir) == ["Housing.csv"]
+
+
+def test_shared_names_do_not_attach_another_database(upload_dir):
+    # "price" is also a Housing column, but Products.UnitPrice covers it
+    assert route_databases("products by unit price", FILES[::-1], upload_dir) == ["northwind.db"]
+
+
+def test_names_only_another_database_has_attach_it(upload_dir):
+    question = "how many orders per customer, and how many bedrooms on average"
+    assert route_databases(question, FILES, upload_dir) == ["northwind.db", "Housing.csv"]
+
+
+def test_naming_a_database_attaches_it(upload_dir):
+    question = "list northwind customers next to housing prices"
+    assert route_databases(question, FILES[::-1], upload_dir) == ["northwind.db", "Housing.csv"]
+
+
+def test_no_match_falls_back_to_the_first_file(upload_dir):
+    assert route_databases("hello there", FILES, upload_dir) == ["northwind.db"]
+    assert route_databases("hello there", FILES[::-1], upload_dir) == ["Housing.csv"]
+
+
+def test_attached_aliases_are_unique_identifiers(upload_dir):
+    files = ["northwind.db", "Sales 2024.db", "sales-2024.db", "2024.db", "main.db"]
+    aliases = [alias for alias, _ in attach_list(files, upload_dir)]
+    assert aliases == ["sales_2024", "sales_2024_2", "db_2024", "db_main"]
+    assert database_alias("Housing.csv") == "housing"
@@ -0,0 +1,77 @@
+import pytest
+from executor import ExecutorPool, budget_message, BUDGET_EXCEEDED
+
+SPIN = "while True:\n    pass"
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**limits):
+        pool = ExecutorPool(1, max_runs=50, max_rss_bytes=2 ** 40, limits=limits)
+        pool.start()
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def _worker_pid(pool):
+    return pool._idle.queue[0].process.pid
+
+
+def _csv_job(file_path, code):
+    return {"loader": "csv", "file_path": file_path, "columns": None, "code": code}
+
+
+def test_plain_jobs_reuse_the_worker(make_pool, housing):
+    pool = make_pool(wall_time=10)
+    pid = _worker_pid(pool)
+    reply = pool.run(_csv_job(housing, "print(len(df))"))
+    assert reply["budget_exceeded"] is None
+    assert reply["output"].strip() == "545"
+    assert _worker_pid(pool) == pid
+
+
+@pytest.mark.parametrize("code", [
+    SPIN,
+    # Generated code's own error handling must not swallow the limit
+    "try:\n    while True:\n        pass\nexcept Exception:\n    print('swallowed')",
+    "try:\n    while True:\n        pass\nexcept BaseException:\n    print('swallowed')",
+], ids=["spin", "except-Exception", "except-BaseException"])
+def test_wall_time_limit_stops_the_job_and_recycles_the_worker(make_pool, housing, code):
+    pool = make_pool(wall_time=1)
+    pid = _worker_pid(pool)
+    reply = pool.run(_csv_job(housing, code))
+    assert reply["budget_exceeded"] == "wall_time"
+    assert _worker_pid(pool) != pid
+    assert budget_message(reply, pool.limits).startswith(BUDGET_EXCEEDED)
+
+
+def test_cpu_time_limit_stops_the_job_and_recycles_the_worker(make_pool, housing):
+    pool = make_pool(cpu_time=1)
+    pid = _worker_pid(pool)
+    reply = pool.run(_csv_job(housing, SPIN))
+    assert reply["budget_exceeded"] == "cpu_time"
+    assert _worker_pid(pool) != pid
+
+
+def test_memory_limit_stops_the_job_and_recycles_the_worker(make_pool, housing):
+    pool = make_pool(memory=3 * 1024 ** 3)
+    pid = _worker_pid(pool)
+    reply = pool.run(_csv_job(housing, "blob = bytearray(8 * 1024 ** 3)\nprint(len(blob))"))
+    assert reply["budget_exceeded"] == "memory"
+    assert _worker_pid(pool) != pid
+
+
+def test_wall_time_limit_during_a_sql_fetch_is_a_budget_error(make_pool, northwind):
+    pool = make_pool(wall_time=1)
+    pid = _worker_pid(pool)
+    reply = pool.run({"loader": "sql", "db_path": northwind, "attach": [], "code": "print(df)",
+                      "sql_query": "SELECT COUNT(*) FROM Orders a, Orders b, Orders c, Orders d"})
+    assert reply["error"] is None
+    assert reply["budget_exceeded"] == "wall_time"
+    assert _worker_pid(pool) != pid
@@ -0,0 +1,68 @@
+import asyncio
+import sqlite3
+from jobs import JobQueue, DONE, FAILED
+
+
+def _queue(tmp_path, workers=1):
+    return JobQueue(str(tmp_path / "jobs.sqlite"), workers, max_pending=0, retention=0)
+
+
+async def _wait_finished(queue, job_id):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never finished")
+
+
+def test_jobs_run_and_store_their_result(tmp_path):
+    queue = _queue(tmp_path)
+
+    async def run(prompt, files):
+        return {"answer": prompt.upper(), "files": files}
+
+    async def main():
+        await queue.start(run)
+        try:
+            job = await queue.submit("hello", ["a.csv"])
+            return await _wait_finished(queue, job["id"])
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(main())
+    assert job["status"] == DONE
+    assert job["result"] == {"answer": "HELLO", "files": ["a.csv"]}
+
+
+def test_worker_survives_bookkeeping_errors(tmp_path):
+    queue = _queue(tmp_path)
+    real_update = queue._update
+    broken = {"first"}
+
+    async def flaky_update(job_id, **fields):
+        if broken:
+            broken.clear()
+            raise sqlite3.OperationalError("database is locked")
+        return await real_update(job_id, **fields)
+
+    queue._update = flaky_update
+
+    async def run(prompt, files):
+        return prompt
+
+    async def main():
+        await queue.start(run)
+        try:
+            first = await queue.submit("first", [])
+            second = await queue.submit("second", [])
+            return await _wait_finished(queue, first["id"]), await _wait_finished(queue, second["id"])
+        finally:
+            await queue.stop()
+
+    first, second = asyncio.run(main())
+    assert first["status"] == FAILED
+    assert "database is locked" in first["error"]
+    # The single worker is still alive and picks up the next job
+    assert second["status"] == DONE
+    assert second["result"] == "second"
@@ -0,0 +1,67 @@
+import sqlite3
+import pytest
+from join_graph import build_join_graph, shortest_join_path, mentioned_tables
+from schema_index import tokenize
+
+
+@pytest.fixture
+def declared(northwind):
+    return build_join_graph(northwind)
+
+
+@pytest.fixture
+def inferred(northwind, tmp_path):
+    """northwind's tables copied without primary or foreign keys."""
+    path = tmp_path / "plain.db"
+    conn = sqlite3.connect(path)
+    conn.execute("ATTACH DATABASE ? AS src", (northwind,))
+    for table in ["Orders", "Order Details", "Products", "Categories", "Customers", "Shippers", "Employees"]:
+        conn.execute(f'CREATE TABLE "{table}" AS SELECT * FROM src."{table}" LIMIT 5')
+    conn.commit()
+    conn.close()
+    return build_join_graph(str(path))
+
+
+def _conditions(graph, table):
+    return {condition for _, condition in graph[table]}
+
+
+def test_declared_foreign_keys_are_edges(declared):
+    assert "[Order Details].ProductID = Products.ProductID" in _conditions(declared, "Products")
+    # Declared keys may use differently named columns
+    assert "Orders.ShipVia = Shippers.ShipperID" in _conditions(declared, "Shippers")
+
+
+def test_self_references_are_not_join_paths(declared):
+    assert all(other != "Employees" for other, _ in declared["Employees"])
+
+
+def test_shortest_path_between_declared_tables(declared):
+    assert shortest_join_path(declared, "Customers", "Products") == [
+        "Orders.CustomerID = Customers.CustomerID",
+        "[Order Details].OrderID = Orders.OrderID",
+        "[Order Details].ProductID = Products.ProductID",
+    ]
+    assert shortest_join_path(declared, "Products", "Products") == []
+
+
+def test_id_columns_are_inferred_without_declared_keys(inferred):
+    assert "Orders.CustomerID = Customers.CustomerID" in _conditions(inferred, "Customers")
+    assert "[Order Details].OrderID = Orders.OrderID" in _conditions(inferred, "Orders")
+    # Names that don't match a table (ShipVia) can't be inferred
+    assert inferred["Shippers"] == []
+
+
+def test_ies_plurals_fold_to_their_singular(inferred):
+    assert tokenize("Categories") == tokenize("Category") == ["category"]
+    assert "Products.CategoryID = Categories.CategoryID" in _conditions(inferred, "Categories")
+
+
+def test_unconnected_tables_have_no_path(inferred):
+    assert shortest_join_path(inferred, "Shippers", "Products") is None
+
+
+def test_mentioned_tables_match_plural_and_spaced_names(declared):
+    tables = mentioned_tables(list(declared), "revenue per category from order details")
+    assert {"Categories", "Order Details"} <= set(tables)
+    assert set(mentioned_tables(list(declared), "sales by category and product")) == {"Categories", "Products"}
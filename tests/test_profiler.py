@@ -0,0 +1,43 @@
+import os
+import pytest
+from profiler import build_profile, answer_from_profiles
+
+
+@pytest.fixture
+def upload_dir(housing):
+    build_profile(housing)
+    return os.path.dirname(housing)
+
+
+def ask(question, upload_dir):
+    return answer_from_profiles(question, ["Housing.csv"], upload_dir)
+
+
+@pytest.mark.parametrize("question", [
+    "What is the max price?",
+    "maximum price",
+    "What's the highest price in Housing.csv?",
+])
+def test_plain_aggregates_are_answered(question, upload_dir):
+    assert ask(question, upload_dir) == "The maximum price in Housing.csv is 13,300,000."
+
+
+def test_row_count_is_answered(upload_dir):
+    assert ask("How many rows are in Housing.csv?", upload_dir) == "Housing.csv has 545 rows."
+
+
+def test_average_is_answered(upload_dir):
+    assert ask("What is the average area?", upload_dir).startswith("The average area in Housing.csv is ")
+
+
+@pytest.mark.parametrize("question", [
+    "What furnishing status has the highest price?",   # argmax
+    "highest price among furnished homes",             # filter
+    "What is the max price in 2020?",                  # filter on a year
+    "What is the mean price, in millions?",            # unit conversion
+    "What is the max price for each furnishingstatus?",
+    "Plot the maximum price",
+    "How many rows have a price above 5000000?",
+])
+def test_anything_beyond_aggregate_and_column_goes_to_the_graph(question, upload_dir):
+    assert ask(question, upload_dir) is None
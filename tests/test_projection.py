@@ -0,0 +1,59 @@
+from projection import referenced_columns
+
+COLUMNS = ["price", "area", "bedrooms", "furnishingstatus"]
+
+
+def test_attribute_access():
+    assert referenced_columns("print(df.price.mean())", COLUMNS) == ["price"]
+
+
+def test_attribute_shadowing_a_dataframe_method_is_not_a_column():
+    assert referenced_columns("print(df.size)", COLUMNS + ["size"]) is None
+
+
+def test_subscripts_return_columns_in_file_order():
+    code = "x = df['area']\ny = df[['price', 'bedrooms']]\nprint(x, y)"
+    assert referenced_columns(code, COLUMNS) == ["price", "area", "bedrooms"]
+
+
+def test_boolean_mask_then_column_selection():
+    code = "print(df[df['area'] > 5000]['price'].mean())"
+    assert referenced_columns(code, COLUMNS) == ["price", "area"]
+
+
+def test_chain_method_string_arguments_count_as_columns():
+    code = "print(df.groupby('furnishingstatus')['price'].mean())"
+    assert referenced_columns(code, COLUMNS) == ["price", "furnishingstatus"]
+
+
+def test_loc_with_named_columns():
+    code = "print(df.loc[df.area > 5000, ['price', 'bedrooms']])"
+    assert referenced_columns(code, COLUMNS) == ["price", "area", "bedrooms"]
+
+
+def test_iloc_with_positions_needs_every_column():
+    assert referenced_columns("print(df.iloc[:, 0])", COLUMNS) is None
+
+
+def test_query_strings_fall_back_to_a_full_load():
+    # Column names inside the expression string aren't analyzed
+    assert referenced_columns("print(df.query('area > 5000')['price'])", COLUMNS) is None
+
+
+def test_whole_frame_use_falls_back_to_a_full_load():
+    assert referenced_columns("print(df.describe())", COLUMNS) is None
+    assert referenced_columns("print(df)", COLUMNS) is None
+    assert referenced_columns("print(len(df))", COLUMNS) is None
+
+
+def test_dynamic_access_falls_back_to_a_full_load():
+    assert referenced_columns("print(getattr(df, 'price'))", COLUMNS) is None
+    assert referenced_columns("print(eval('df.price'))", COLUMNS) is None
+
+
+def test_syntax_errors_fall_back_to_a_full_load():
+    assert referenced_columns("print(df['price'", COLUMNS) is None
+
+
+def test_code_not_reading_known_columns_falls_back_to_a_full_load():
+    assert referenced_columns("print(1 + 1)", COLUMNS) is None
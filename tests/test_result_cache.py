@@ -0,0 +1,50 @@
+import sqlite3
+import pytest
+from sqlite_pool import db_fingerprint
+from result_cache import ResultCache
+
+
+@pytest.mark.parametrize("code", [
+    "print(df.sample(5))",
+    "import random\nprint(random.choice(df.price))",
+    "print(pd.Timestamp.NOW())",
+    "print(pd.Timestamp.today())",
+])
+def test_nondeterministic_code_is_not_cached(code):
+    assert not ResultCache.cacheable(code)
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT * FROM Orders ORDER BY RANDOM() LIMIT 5",
+    "select * from Orders order by random() limit 5",
+    "SELECT * FROM Orders WHERE OrderDate > date('now', '-30 days')",
+    "SELECT CURRENT_TIMESTAMP, * FROM Orders",
+    "SELECT current_date",
+])
+def test_nondeterministic_sql_is_not_cached(sql_query):
+    assert not ResultCache.cacheable("print(df.head())", sql_query)
+
+
+def test_deterministic_code_and_sql_are_cached():
+    assert ResultCache.cacheable("print(df.price.mean())")
+    assert ResultCache.cacheable("print(df.head())", "SELECT ProductName, UnitPrice FROM Products")
+
+
+def test_writes_to_the_wal_change_the_database_key(tmp_path):
+    db_path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE orders (id INTEGER)")
+    conn.commit()
+    try:
+        before = ResultCache.make_key("db_python_analyst", db_path, fingerprint_of=db_fingerprint,
+                                      code="print(len(df))", sql_query="SELECT * FROM orders")
+        # The open connection keeps the write in shop.db-wal, not in shop.db
+        conn.execute("INSERT INTO orders VALUES (1)")
+        conn.commit()
+        after = ResultCache.make_key("db_python_analyst", db_path, fingerprint_of=db_fingerprint,
+                                     code="print(len(df))", sql_query="SELECT * FROM orders")
+    finally:
+        conn.close()
+    assert before[0] != after[0]
+    assert before[2] != after[2]
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flights = SingleFlight()
+    calls = []
+
+    async def make():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"answer": 42}
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("q", make) for _ in range(5)))
+        other = await flights.do("other", make)
+        return results, other
+
+    results, other = asyncio.run(main())
+    assert results == [{"answer": 42}] * 5
+    assert other == {"answer": 42}
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight()
+    calls = []
+
+    async def make():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flights.do("q", make) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(e, ValueError) and str(e) == "boom" for e in errors)
+
+
+def test_entry_is_dropped_once_done():
+    flights = SingleFlight()
+    calls = []
+
+    async def make():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        first = await flights.do("q", make)
+        await asyncio.sleep(0)  # let the done callback run
+        assert len(flights) == 0
+        # Not cached: the next call runs again
+        return first, await flights.do("q", make)
+
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_run():
+    flights = SingleFlight()
+
+    async def make():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        leaving = asyncio.ensure_future(flights.do("q", make))
+        staying = asyncio.ensure_future(flights.do("q", make))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(main()) == "done"
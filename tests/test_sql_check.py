@@ -0,0 +1,64 @@
+import pytest
+from sql_check import check_query
+
+
+def test_valid_select_passes(northwind):
+    query = ("SELECT p.ProductName, SUM(od.Quantity) FROM [Order Details] od "
+             "JOIN Products p ON od.ProductID = p.ProductID GROUP BY p.ProductName")
+    assert check_query(northwind, query) is None
+    assert check_query(northwind, "WITH t AS (SELECT 1 AS x) SELECT x FROM t;") is None
+
+
+@pytest.mark.parametrize("query", [
+    "DELETE FROM Orders",
+    "UPDATE Products SET UnitPrice = 0",
+    "DROP TABLE Orders",
+    "INSERT INTO Categories (CategoryName) VALUES ('x')",
+    "PRAGMA writable_schema = 1",
+])
+def test_write_statements_are_rejected(northwind, query):
+    assert check_query(northwind, query) == "Error: Only read-only SELECT queries are allowed."
+
+
+def test_empty_query_is_rejected(northwind):
+    assert check_query(northwind, "  ;  ") == "Error: Empty query."
+
+
+def test_unknown_table_suggests_close_names(northwind):
+    error = check_query(northwind, "SELECT * FROM Product")
+    assert error.startswith("Error: no such table: Product.")
+    assert "Did you mean: Products" in error
+
+
+def test_table_name_missing_its_space_suggests_quoting(northwind):
+    error = check_query(northwind, "SELECT * FROM OrderDetails")
+    assert "Order Details" in error and "[Name]" in error
+
+
+def test_unknown_column_suggests_close_columns(northwind):
+    error = check_query(northwind, "SELECT ProductNam FROM Products")
+    assert error.startswith("Error: no such column: ProductNam.")
+    assert "Products.ProductName" in error
+
+
+def test_unknown_column_only_suggests_columns_of_the_queried_tables(northwind):
+    error = check_query(northwind, "SELECT Nope FROM Products")
+    assert "Employees" not in error
+    assert "Products: ProductID, ProductName" in error
+
+
+def test_unknown_column_points_to_a_near_identical_column_elsewhere(northwind):
+    error = check_query(northwind, "SELECT UnitPrce FROM Orders")
+    assert "Not a column of Orders" in error
+    assert "Order Details.UnitPrice" in error
+
+
+def test_ambiguous_column_names_its_tables(northwind):
+    error = check_query(northwind, "SELECT ProductID FROM Products p JOIN [Order Details] od "
+                                 "ON p.ProductID = od.ProductID")
+    assert error.startswith("Error: ambiguous column name: ProductID.")
+    assert "qualify it with a table alias" in error
+
+
+def test_syntax_errors_are_reported(northwind):
+    assert check_query(northwind, "SELECT FROM Products").startswith("Error: ")
@@ -0,0 +1,87 @@
+import os
+import pytest
+from sql_results import sql_result_store, run_query
+
+
+def _stored_files(db_path):
+    directory = os.path.join(os.path.dirname(db_path), ".cache", "sql_results")
+    return [f for f in os.listdir(directory) if f.endswith(".arrow")] if os.path.isdir(directory) else []
+
+
+def test_sql_tool_results_stay_in_memory_until_described(northwind):
+    query = "SELECT CategoryName FROM Categories ORDER BY CategoryID"
+    df = run_query(northwind, query, persist=False)
+    assert _stored_files(northwind) == []
+
+    # Answered again without running the query or touching the disk
+    again, stored_query = sql_result_store.get(northwind, query)
+    assert stored_query == query
+    assert list(again["CategoryName"]) == list(df["CategoryName"])
+    assert _stored_files(northwind) == []
+
+    # The chart step describes it: now it is on disk for the executors
+    columns, rows = sql_result_store.describe(northwind, query)
+    assert rows == len(df)
+    assert [name for name, _ in columns] == ["CategoryName"]
+    assert len(_stored_files(northwind)) == 1
+
+
+def test_persisted_results_are_written_right_away(northwind):
+    run_query(northwind, "SELECT COUNT(*) AS n FROM Orders")
+    assert len(_stored_files(northwind)) == 1
+
+
+def test_normalize_sql_folds_case_outside_quotes():
+    from sql_results import normalize_sql
+    assert normalize_sql("SELECT Name FROM [Order Details] WHERE City = 'London'") == \
+        "select name from [Order Details] where city = 'London'"
+    assert normalize_sql('SELECT "Unit Price" FROM t') == 'select "Unit Price" from t'
+
+
+def test_normalize_sql_drops_comments_and_collapses_whitespace():
+    from sql_results import normalize_sql
+    query = "SELECT  a,\n\tb -- pick columns\nFROM t /* the table */ ;  "
+    assert normalize_sql(query) == "select a, b from t"
+
+
+def test_normalize_sql_keeps_whitespace_inside_literals():
+    from sql_results import normalize_sql
+    assert normalize_sql("SELECT * FROM t WHERE s = 'a  b'") == "select * from t where s = 'a  b'"
+
+
+def test_equivalent_spellings_share_a_cache_entry(northwind):
+    a = "SELECT COUNT(*) FROM Orders WHERE ShipCountry = 'France'"
+    b = "select count(*)\n  from orders   -- French orders\n where shipcountry = 'France';"
+    assert sql_result_store.path_for(northwind, a) == sql_result_store.path_for(northwind, b)
+
+
+def test_different_literals_get_different_cache_entries(northwind):
+    a = "SELECT COUNT(*) FROM Orders WHERE ShipCountry = 'France'"
+    b = "SELECT COUNT(*) FROM Orders WHERE ShipCountry = 'FRANCE'"
+    c = "SELECT COUNT(*) FROM Orders WHERE ShipCountry = 'Germany'"
+    assert len({sql_result_store.path_for(northwind, q) for q in (a, b, c)}) == 3
+
+
+def test_equivalent_query_reuses_the_stored_result_with_its_own_column_names(northwind):
+    run_query(northwind, "SELECT COUNT(*) FROM Orders")
+    df = run_query(northwind, "select count(*)   from orders")
+    assert list(df.columns) == ["count(*)"]
+    assert df.iloc[0, 0] == run_query(northwind, "SELECT COUNT(*) FROM Orders").iloc[0, 0]
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_nondeterministic_queries_are_never_stored(northwind, persist):
+    query = ("SELECT strftime('%H:%M:%f', 'now') AS t, ProductName FROM Products "
+             "ORDER BY RANDOM() LIMIT 3")
+    first = run_query(northwind, query, persist=persist)
+    assert sql_result_store.get(northwind, query) is None
+    assert _stored_files(northwind) == []
+    second = run_query(northwind, query, persist=persist)
+    assert len(first) == len(second) == 3
+    assert sql_result_store.describe(northwind, query) is None
+
+
+def test_queries_relative_to_now_always_run(northwind):
+    query = "SELECT COUNT(*) AS n FROM Orders WHERE OrderDate > date('now', '-30 days')"
+    run_query(northwind, query)
+    assert sql_result_store.get(northwind, query) is None
@@ -1,15 +1,27 @@
 import os 
-import pandas as pd
-import matplotlib.pyplot as plt
-import sqlite3
-from datetime import datetime
+import uuid
 from langchain_core.tools import tool
-from langchain_experimental.utilities import PythonREPL
-from langchain_community.utilities import SQLDatabase
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from config import llm
+from langchain_community.tools.sql_database.tool import (
+    InfoSQLDatabaseTool,
+    ListSQLDatabaseTool,
+    QuerySQLDatabaseTool,
+)
+from data_cache import csv_columns
+from projection import referenced_columns
+from chunked import is_large_csv
+from executor import executor_pool, budget_message
+from result_cache import result_cache
+from sql_engine import sql_registry
+from sqlite_pool import db_fingerprint
+from db_router import attach_list
+from sql_check import check_query
+from sql_results import run_query, format_rows, QueryTooExpensive, QUERY_TOO_EXPENSIVE
+
+
+def _chart_path(charts_dir, name):
+    """Unique per call, so concurrent jobs on one file never share an image."""
+    return os.path.join(charts_dir, f"{name}_chart_{uuid.uuid4().hex}.png")
 
-python_repl = PythonREPL()
 
 @tool
 def python_analyst(code: str, file_name: str):
@@ -27,29 +39,36 @@ def python_analyst(code: str, file_name: str):
         if not os.path.exists(file_path):
             return f"Error: {file_name} not found in uploads/."
 
-        # 2. Force fresh load
-        df = pd.read_csv(file_path)
-
-        # 3. Isolated execution environment
-        plt.switch_backend('Agg')
-
-        # 4. Inject globals into REPL
-        python_repl.globals = {"df": df, "pd": pd, "plt": plt}
-        
-        # 5. Execute
-        result = python_repl.run(code)
-
-        # 6. Detect any matplotlib figures and save them
-        fig_path = None
-        figs = [plt.figure(n) for n in plt.get_fignums()]
-        if figs:
-            base_name = os.path.splitext(os.path.basename(file_name))[0]
-            fig_name = f"{base_name}_chart.png"
-            fig_path = os.path.join(charts_dir, fig_name)
-            figs[-1].savefig(fig_path)
-            plt.close(figs[-1])
-
-        # 7. Format textual output
+        # Same code on the same version of the file: reuse the last result
+        cache_key, source, fingerprint = result_cache.make_key("python_analyst", file_path, code=code)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # 2. Describe how the worker loads df (cached per file version there).
+        # Only the columns the code provably reads; None means all of them.
+        # Files too large for memory are streamed in chunks instead.
+        if is_large_csv(file_path):
+            job = {"loader": "chunked", "file_path": file_path}
+        else:
+            columns = referenced_columns(code, csv_columns(file_path))
+            job = {"loader": "csv", "file_path": file_path, "columns": columns}
+
+        # 3. Any figure left open is saved here
+        base_name = os.path.splitext(os.path.basename(file_name))[0]
+        job["chart_path"] = _chart_path(charts_dir, base_name)
+        job["code"] = code
+
+        # 4. Execute in an isolated, pre-warmed executor process
+        reply = executor_pool.run(job)
+        if reply["budget_exceeded"]:
+            return budget_message(reply, executor_pool.limits)
+        if reply["error"]:
+            return f"Python Error: {reply['error']}"
+        result = reply["output"]
+        fig_path = reply["chart_path"]
+
+        # 5. Format textual output
         output_text = ""
         if isinstance(result, dict):
             output_text = str(result)
@@ -60,11 +79,14 @@ def python_analyst(code: str, file_name: str):
         else:
             output_text = "Execution successful, but no result was printed. Please use print()."
 
-        # 8. Append chart info if a figure was saved
+        # 6. Append chart info if a figure was saved
         if fig_path:
             output_text += f"\n[Chart saved to {fig_path}]"
 
-        return output_text.strip()
+        output_text = output_text.strip()
+        if result_cache.cacheable(code):
+            result_cache.put(cache_key, source, fingerprint, output_text, fig_path)
+        return output_text
 
     except Exception as e:
         return f"Python Error: {str(e)}"
@@ -75,52 +97,67 @@ def db_python_analyst(code: str, db_file: str, sql_query: str):
     """
     Analyzes SQL query results using Python.
     Data is provided as rows + columns and loaded as DataFrame `df`.
+    For a query spanning several databases, db_file lists them comma-separated.
     Always use print().
     Returns STRING.
     """
     try:
-        # 1. Load data from database
+        db_files = [os.path.basename(f.strip()) for f in db_file.split(",") if f.strip()]
+        db_file = db_files[0]
         db_path = os.path.join("uploads", db_file)
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query(sql_query, conn)
-        conn.close()
-
-        print(f"DEBUG: Loaded {len(df)} rows from database")
-
-        # 2. Setup charts directory
+        attach = attach_list(db_files)
+
+        # Same code and query on the same version of the database(s): reuse the result
+        cache_key, source, fingerprint = result_cache.make_key(
+            "db_python_analyst", db_path, fingerprint_of=db_fingerprint,
+            code=code, sql_query=sql_query,
+            attached=[[alias, *db_fingerprint(path)] for alias, path in attach],
+        )
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # 1. Setup charts directory
         charts_dir = "charts"
         os.makedirs(charts_dir, exist_ok=True)
 
-        # 3. Setup matplotlib
-        plt.switch_backend("Agg")
-        python_repl.globals = {"df": df, "pd": pd, "plt": plt}
-
-        # 4. Execute the code
-        result = python_repl.run(code)
-
-        # 5. Save any generated figures with unique timestamp
-        fig_path = None
-        figs = [plt.figure(n) for n in plt.get_fignums()]
-        if figs:
-            # Create unique filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            db_name = os.path.splitext(db_file)[0]
-            fig_name = f"{db_name}_chart_{timestamp}.png"
-            fig_path = os.path.join(charts_dir, fig_name)
-            
+        # 2. Unique chart filename
+        db_name = os.path.splitext(db_file)[0]
+        fig_path = _chart_path(charts_dir, db_name)
+
+        # 3. Load data from database and execute the code in an executor process
+        reply = executor_pool.run({
+            "loader": "sql",
+            "db_path": db_path,
+            "attach": attach,
+            "sql_query": sql_query,
+            "code": code,
+            "chart_path": fig_path,
             # Save with high quality
-            figs[-1].savefig(fig_path, dpi=150, bbox_inches='tight')
-            plt.close(figs[-1])
-            
+            "savefig": {"dpi": 150, "bbox_inches": "tight"},
+        })
+        if reply["budget_exceeded"]:
+            return budget_message(reply, executor_pool.limits)
+        if reply["error"]:
+            if reply["error"].startswith(QUERY_TOO_EXPENSIVE):
+                return reply["error"]
+            return f"Python Error: {reply['error']}\n\nDetails:\n{reply['traceback']}"
+
+        print(f"DEBUG: Loaded {reply['rows']} rows from database")
+        result = reply["output"]
+        fig_path = reply["chart_path"]
+        if fig_path:
             print(f"DEBUG: Chart saved to {fig_path}")
 
-        # 6. Format output
+        # 4. Format output
         output = result.strip() if result else "Chart created successfully."
         if fig_path:
             # Use absolute path so user can find it easily
             abs_path = os.path.abspath(fig_path)
             output += f"\n\n📊 Chart saved to: {abs_path}"
 
+        if result_cache.cacheable(code, sql_query):
+            result_cache.put(cache_key, source, fingerprint, output, fig_path)
         return output
 
     except Exception as e:
@@ -130,19 +167,61 @@ def db_python_analyst(code: str, db_file: str, sql_query: str):
 
     
 
-def get_sql_tools(db_file: str):
-    """Dynamically creates SQL tools for a specific uploaded database."""
+class StoredQuerySQLDatabaseTool(QuerySQLDatabaseTool):
+    """
+    The toolkit's query tool, but the query is validated locally first and
+    the rows are kept in the SQL result store so a follow-up chart over the
+    same query doesn't run it again.
+    """
 
-    db_path = os.path.join("uploads", os.path.basename(db_file))
+    db_path: str
+    attach: tuple = ()
+    description: str = """
+    Execute a SQL query against the database and get back the result.
+    The query is checked first; if it is not correct (syntax, unknown or
+    ambiguous tables/columns), an error message with suggestions is returned.
+    If an error is returned, rewrite the query and try again.
+    """
 
-    if not os.path.exists(db_path):
-        raise RuntimeError(f"Database file not found: {db_path}")
+    def _run(self, query: str, run_manager=None):
+        error = check_query(self.db_path, query, self.attach)
+        if error:
+            print(f"DEBUG: SQL check failed: {error}")
+            return error
+        try:
+            # Kept in memory; written for the executors only if a chart needs it
+            return format_rows(run_query(self.db_path, query, self.attach, persist=False))
+        except QueryTooExpensive as e:
+            print(f"WARNING: {e.kind} limit hit by SQL query: {query}")
+            return str(e)
+        except Exception as e:
+            return f"Error: {e}"
+
+
+def _build_sql_tools(db, db_path, attach=()):
+    # The toolkit's LLM-backed query checker is replaced by the local check
+    # inside sql_db_query, saving a model round trip per query
+    return [
+        StoredQuerySQLDatabaseTool(db=db, db_path=db_path, attach=tuple(attach)),
+        InfoSQLDatabaseTool(db=db),
+        ListSQLDatabaseTool(db=db),
+    ]
+
+
+def get_sql_tools(db_file: str, attach_files=()):
+    """
+    Returns the SQL tools for a specific uploaded database, with the
+    `attach_files` databases attached so queries can join across them.
+    Built once per version of the files and reused by every SQL loop
+    iteration.
+    """
 
-    db = SQLDatabase.from_uri(f"sqlite:///{db_path}", include_tables=None)
-    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-    tools = toolkit.get_tools()
+    db_path = os.path.join("uploads", os.path.basename(db_file))
+    attach = attach_list([db_file, *attach_files])
 
-    for t in tools:
-        t.name = "sql_db_query"
+    for path in [db_path] + [p for _, p in attach]:
+        if not os.path.exists(path):
+            raise RuntimeError(f"Database file not found: {path}")
 
-    return tools
\ No newline at end of file
+    _, tools = sql_registry.get(db_path, _build_sql_tools, attach)
+    return tools